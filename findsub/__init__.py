@@ -0,0 +1,10 @@
+#! /usr/bin/python3.9
+
+"""
+FindSub: finding and ranking subtitles by how much they are synced.
+See `api.py` for using it within python code.
+Compatible with python3.9+.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+from .api import Ranking, SubtitleResult, rank
@@ -11,13 +11,13 @@ a possible speech each of the subtitles has a text.
 
 Required PyPI Packages:
     `cloudscraper` library is required. -> https://pypi.org/project/cloudscraper/
-    `beautifulsoup4` library is required. -> https://pypi.org/project/beautifulsoup4/
     `lxml` library is required. -> https://pypi.org/project/lxml/
     `webrtcvad` library is required. -> https://pypi.org/project/webrtcvad/
     `IMDbPY` library is required. -> https://pypi.org/project/IMDbPY/
     `srt` library is required. -> https://pypi.org/project/srt/
     `Cython` is required. -> https://pypi.org/project/Cython/
     `tqdm` library is required. -> https://pypi.org/project/tqdm/
+    `numpy` library is required. -> https://pypi.org/project/numpy/
 Required External Tools:
     `FFmpeg` is required. -> https://www.ffmpeg.org/
     `FFprobe` is required. -> https://ffmpeg.org/ffprobe.html
@@ -32,76 +32,247 @@ Usage:
         using already extracted audio. (faster!)
     findsub -l/--language en/english <file> -> getting english subtitles.
         default is set by "FINDSUB_LANG" environment variable otherwise "English".
+    findsub -l/--language en,fa <file> -> getting english and persian subtitles
+        in one run; every language is ranked to its own directory in `Subs`.
     findsub -s/--subscene <subscene-link> <file> -> no link suggestion. (faster!)
     findsub -d/--subtitles-directory <path-of-downloaded-subtitles> <file> ->
         using already download subtitles.
+    findsub -c/--corpus <corpus.db> <file> -> using subtitles of a local corpus.
+        (see `corpus.py` for importing subtitles to a corpus) The movie is looked up
+        by IMDB, then by its file name; --title/--year give it explicitly.
+    findsub -t/--thresholds 0.85 0.7 -w/--weighted <file> -> scoring with several
+        thresholds and a speech ratio weighted score from a single VAD pass.
+    findsub -m/--max-memory 512 --top 20 <file> -> streaming subtitles through
+        parsing and matching in batches by one pool of workers, both sized to stay
+        below 512 MiB, keeping the best 20.
+    findsub --vad energy <file> -> a vectorized energy based VAD. (spectrum of
+        loud frames only; faster, less accurate)
+    findsub --anytime [--stop-stable 5] <file> -> provisional rankings while VAD
+        is running; stop once order of the best 5 does not change anymore.
+    findsub --scratch /mnt/ssd --scratch-budget 4096 <file> -> temporary files
+        (up to 4 GiB) are made on a local disk, only Subs is written next to the movie.
+    findsub --cleanup <file> -> on failure remove extracted audio and downloaded
+        subtitles. (by default they are kept and a rerun resumes from them)
+    findsub --ignore-embedded <file> -> do not use the embedded text subtitle
+        of the movie as base. (by default it is used and VAD is skipped)
 Compatible with python3.9+.
 Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 """
 
+import itertools
 import multiprocessing
 import os
-import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
+
+from .checkpoint import Checkpoint, audio_source
 from .clean import iconv_subtitles, prepare_files
 from .cli import parsing_args
-from .download import Downloader
-from .ffmpeg import extract_audio
+from .corpus import CorpusProvider
+from .download import Downloader, SubtitleProvider
+from .ffmpeg import extract_audio, extract_embedded_subtitle, probe
+from .index import SubtitleIndex, timeline_identity
 from .movie import Movie
-from .pycore import match_all
-from .pyvideo import make_base
-from .subtitles import extract_subtitle_time, extract_subtitle_times
+from .pycore import (
+    AnytimeRanker,
+    match_all,
+    match_all_ratios,
+    match_bounded,
+    speech_coverage,
+)
+from .pyvideo import (
+    VadEngine,
+    iter_speech_ratios,
+    make_vad,
+    ratios_to_base,
+    speech_ratios,
+    wave_seconds,
+)
+from .subtitles import (
+    extract_subtitle_time,
+    extract_subtitle_times,
+    group_duplicates,
+    iter_subtitle_times,
+    memory_plan,
+)
 from .tools import clear, emergency_cleanup, make_subs_dir
 
 
+def anytime_ranking(
+    audio: Path,
+    sub_time_structures: dict[str, dict],
+    engine: VadEngine,
+    stop_stable: Optional[int] = None,
+) -> tuple[dict[str, AnytimeRanker], Optional[np.ndarray]]:
+    """
+    Ranking subtitles of every language while Voice Activity Detector goes on,
+    printing provisional best ones after every block. If stop_stable is given,
+    the analysis stops when the best stop_stable subtitles of all the languages
+    keep their order. Speech ratios of the whole movie are returned too, None if
+    the analysis is stopped.
+    """
+    length = wave_seconds(audio)
+    rankers = {
+        lang: AnytimeRanker(times, length, top_k=stop_stable or 5)
+        for lang, times in sub_time_structures.items()
+    }
+    print("Voice Activity Detector started the analysis.")
+    blocks = []
+    for ratios in iter_speech_ratios(audio, engine=engine):
+        blocks.append(ratios)
+        for lang, ranker in rankers.items():
+            ranking = ranker.update(ratios)
+            best = ", ".join(
+                f"{name} {score:.2%}"
+                for name, score in itertools.islice(ranking.items(), 3)
+            )
+            print(
+                f"[{ranker.progress:.0%} analyzed, ±{ranker.margin:.1%}] "
+                f"{lang if len(rankers) > 1 else 'Best'}: {best}"
+            )
+        if stop_stable is not None and all(r.stable for r in rankers.values()):
+            print(f"Best {stop_stable} subtitles are stable; stopping the analysis.")
+            return rankers, None
+    return rankers, np.concatenate(blocks) if blocks else np.zeros(0, np.float32)
+
+
 def main(
     movie: Movie,
-    language: str,
+    languages: list[str],
     audio: Optional[Path] = None,
     subscene: Optional[str] = None,
     subtitles_directory: Optional[Path] = None,
     synced_subtitle: Optional[Path] = None,
+    embedded: bool = True,
+    corpus: Optional[Path] = None,
+    title: Optional[str] = None,
+    year: Optional[str] = None,
+    thresholds: Optional[list[float]] = None,
+    weighted: bool = False,
+    vad: str = "webrtc",
+    vad_mode: int = 0,
+    max_memory: Optional[int] = None,
+    top: Optional[int] = None,
+    anytime: bool = False,
+    stop_stable: Optional[int] = None,
+    subs_directory: Optional[Path] = None,
 ) -> None:
     """
     Main entry point. It should not be used within python code. Designed for CLI.
+    Use `findsub.rank` (see `api.py`) instead.
+    Results go to `Subs` next to the movie (or the subtitles), or to subs_directory.
     """
 
-    cached_audio = movie.dir / f".{movie.filename_hash}_audio_completed.wav"
+    movie.scratch.mkdir(parents=True, exist_ok=True)
+    cached_audio = movie.temp("_audio_completed.wav")
+    embedded_subtitle = movie.temp("_embedded.srt")
+    # Completed stages of a failed run are not done again.
+    checkpoint = Checkpoint(movie)
+    timeline_source = audio_source(movie, audio)
 
+    ratios = None
+    synced_times = None
     if synced_subtitle is None:
+        ratios = checkpoint.load_ratios(vad, vad_mode, timeline_source)
+        if ratios is not None:
+            print("Speech timeline is already made; resuming.")
+            audio = cached_audio  # Not needed anymore.
+
         if audio is None:  # Check for extracted audio file.
             if cached_audio.is_file():
                 audio = cached_audio
 
         if audio is None:
+            info = probe(movie)
+            # An embedded text subtitle is synced by definition; no need for VAD.
+            if embedded and extract_embedded_subtitle(movie, embedded_subtitle, info):
+                embedded_times = extract_subtitle_time(embedded_subtitle)
+                embedded_subtitle.unlink(missing_ok=True)
+                if embedded_times:  # Useless if it has no cues.
+                    print("Embedded subtitle found, using it as base.")
+                    synced_subtitle = embedded_subtitle
+                    synced_times = embedded_times
+                else:
+                    print("Embedded subtitle is empty; audio is used instead.")
+
+        if synced_subtitle is None and audio is None:
             process = multiprocessing.Process(
-                target=extract_audio, args=(movie, cached_audio), daemon=True
+                target=extract_audio,
+                args=(movie, cached_audio, info),
+                daemon=True,
             )
             process.start()
             print("Audio extraction begins.")
 
     # If user already has a directory of subtitles, we must not move them to the Subs.
     move = True
+    sub_time_structures = {}
     if subtitles_directory is None:
-        subtitles_directory = Downloader(
-            movie=movie, lang=language, link=subscene
-        ).download()
-        prepare_files(subtitles_directory)
+        subtitles_directory = movie.temp()
+        subs = movie.dir / "Subs"
+        if corpus is None:
+            subtitles_source = {"subscene": subscene}
+        else:
+            subtitles_source = {"corpus": str(corpus), "title": title, "year": year}
+        if (resumed := checkpoint.subtitles(languages, subtitles_source)) is not None:
+            print("Subtitles are already downloaded; resuming.")
+            directories = resumed
+        else:
+            provider: SubtitleProvider
+            if corpus is None:
+                provider = Downloader(movie=movie, langs=languages, link=subscene)
+            else:
+                provider = CorpusProvider(
+                    movie=movie, langs=languages, corpus=corpus, title=title, year=year
+                )
+            # One listing for all the languages, one directory for each of them.
+            directories = provider.download()
+            for lang, directory in directories.items():
+                if (times := provider.parsed_times(lang)) is None:
+                    prepare_files(directory, movie)
+                else:
+                    sub_time_structures[lang] = times
+            checkpoint.done_subtitles(languages, directories, subtitles_source)
     else:
         move = False
-        iconv_subtitles(subtitles_directory)
+        subs = subtitles_directory.parent / "Subs"
+        directories = {languages[0]: subtitles_directory}
+    if subs_directory is not None:
+        subs = subs_directory
+    # Parsed timings (and scores) are kept in a sidecar index of every directory;
+    # only new or changed subtitles are converted, parsed and matched.
+    indexes = {
+        lang: SubtitleIndex(directory) for lang, directory in directories.items()
+    }
+    if not move:
+        iconv_subtitles(
+            subtitles_directory,
+            indexes[languages[0]].changed_files(subtitles_directory),
+        )
 
-    try:
+    # In bounded memory mode subtitles are streamed through parsing and matching.
+    if max_memory is None:
         print("Examining subtitles.", end=" ", flush=True)
-        sub_time_structures = extract_subtitle_times(subtitles_directory)
-    except UnicodeError:
-        clear(subtitles_directory, cached_audio, remove=move)
-        raise
-    else:
+        for lang, directory in directories.items():
+            if lang not in sub_time_structures:
+                try:
+                    sub_time_structures[lang] = extract_subtitle_times(
+                        directory, indexes[lang]
+                    )
+                except UnicodeError:
+                    print(f"Cannot read any of the {lang} subtitles.", end=" ")
+                indexes[lang].save()
+        if not sub_time_structures:
+            clear(subtitles_directory, cached_audio, remove=move)
+            raise UnicodeError("Cannot read any of the subtitles.")
         print("Done.")
 
+    rankers: dict[str, AnytimeRanker] = {}
+    movie_time_structure: list[tuple[int, int]] = []  # Unknown if VAD is stopped.
     if synced_subtitle is None:
         if audio is None:
             print("Waiting for audio extraction to finish.", end=" ", flush=True)
@@ -110,11 +281,26 @@ def main(
             audio = cached_audio
             print("Done.")
 
-        print("Voice Activity Detector started the analysis.", end=" ", flush=True)
-        movie_time_structure = make_base(audio)
-        print("Done.")
+        if ratios is None and anytime:
+            rankers, ratios = anytime_ranking(
+                audio, sub_time_structures, make_vad(vad, vad_mode), stop_stable
+            )
+            if ratios is not None:
+                checkpoint.save_ratios(ratios, vad, vad_mode, timeline_source)
+        elif ratios is None:
+            print("Voice Activity Detector started the analysis.", end=" ", flush=True)
+            ratios = speech_ratios(audio, engine=make_vad(vad, vad_mode))
+            checkpoint.save_ratios(ratios, vad, vad_mode, timeline_source)
+            print("Done.")
+        if ratios is not None:
+            # Provisional scores were estimates (or there were none, the whole
+            # timeline is already there); final ones are as without anytime.
+            anytime = False
+            movie_time_structure = ratios_to_base(ratios)
     else:
-        temp_movie_time_structure = extract_subtitle_time(synced_subtitle)
+        anytime = False  # There is no analysis to wait for.
+        if (temp_movie_time_structure := synced_times) is None:
+            temp_movie_time_structure = extract_subtitle_time(synced_subtitle)
         if temp_movie_time_structure:  # if it's not empty.
             movie_time_structure = [
                 (
@@ -123,14 +309,71 @@ def main(
                 )
                 for i in temp_movie_time_structure
             ]
+            # The last dialog does not necessarily end last.
+            length = (
+                int(max(end.total_seconds() for _, end in temp_movie_time_structure))
+                + 1
+            )
+            ratios = speech_coverage(temp_movie_time_structure, length)
         else:
             clear(subtitles_directory, cached_audio, remove=move)
             raise UnicodeError(f"Cannot read '{synced_subtitle}'.")
 
-    results = match_all(movie_time_structure, sub_time_structures)
+    # The speech timeline is computed once and shared by all the languages.
+    for lang, directory in directories.items():
+        if lang not in sub_time_structures and max_memory is None:
+            continue  # Unreadable.
+        if len(directories) > 1:
+            print(f"Ranking {lang} subtitles.")
+        groups = details = None
+        if lang not in sub_time_structures:
+            workers, size = memory_plan(max_memory)  # type: ignore
+            # One pool, sized by the ceiling too, both parses and matches.
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = match_bounded(
+                    movie_time_structure,
+                    iter_subtitle_times(directory, size, executor),
+                    executor,
+                    top,
+                )
+            if not results:
+                print(f"Cannot read any of the {lang} subtitles.")
+                continue
+        elif anytime:
+            results, groups = rankers[lang].ranking(), rankers[lang].groups
+        elif thresholds or weighted:
+            assert ratios is not None  # Only a stopped anytime analysis has none.
+            lang_time_structures = sub_time_structures[lang]
+            groups = group_duplicates(lang_time_structures)
+            results, details = match_all_ratios(
+                ratios, lang_time_structures, thresholds or [], weighted, groups
+            )
+        else:
+            lang_time_structures = sub_time_structures[lang]
+            groups = group_duplicates(lang_time_structures)
+            results = match_all(
+                movie_time_structure,
+                lang_time_structures,
+                groups,
+                index=indexes[lang],
+                timeline=timeline_identity(movie_time_structure),
+            )
+
+        make_subs_dir(
+            directory,
+            results,
+            subs=subs / lang if len(directories) > 1 else subs,
+            move=move,
+            groups=groups,
+            details=details,
+            movie=movie,
+        )
+
+    if not move:
+        indexes[languages[0]].save()
 
-    make_subs_dir(subtitles_directory, results, move=move)
     clear(subtitles_directory, cached_audio, remove=move)
+    checkpoint.remove()
 
     print("Done.")
 
@@ -144,26 +387,67 @@ def run():
     assert args.file.is_file(), f"Cannot find {args.file!r}"
     if args.audio is not None:
         assert args.file.is_file(), f"Cannot find {args.file!r}"
+    if args.max_memory is not None:
+        assert not (
+            args.thresholds or args.weighted
+        ), "-m/--max-memory cannot be used with -t/--thresholds or -w/--weighted."
+    if args.anytime or args.stop_stable is not None:
+        assert not (
+            args.max_memory or args.thresholds or args.weighted
+        ), "--anytime cannot be used with -m, -t or -w options."
+    if args.corpus is not None:
+        assert args.corpus.is_file(), f"Cannot find {args.corpus!r}"
+    else:
+        assert (
+            args.title is None and args.year is None
+        ), "--title and --year can only be used with -c/--corpus."
     if args.subtitles_directory is not None:
         assert (
             args.subtitles_directory.is_dir()
         ), f"Cannot find {args.subtitles_directory!r}"
+        assert (
+            len(args.languages) == 1
+        ), "-d/--subtitles-directory holds subtitles of only one language."
 
-    movie = Movie(args.file)
+    movie = Movie(
+        args.file,
+        scratch=args.scratch,
+        budget=None if args.scratch_budget is None else args.scratch_budget * 2**20,
+    )
 
     try:
         main(
             movie=movie,
-            language=args.language,
+            languages=args.languages,
             audio=args.audio,
             subscene=args.subscene,
             subtitles_directory=args.subtitles_directory,
             synced_subtitle=args.synced_subtitle,
+            embedded=not args.ignore_embedded,
+            corpus=args.corpus,
+            title=args.title,
+            year=args.year,
+            thresholds=args.thresholds,
+            weighted=args.weighted,
+            vad=args.vad,
+            vad_mode=args.vad_mode,
+            max_memory=args.max_memory,
+            top=args.top,
+            anytime=args.anytime or args.stop_stable is not None,
+            stop_stable=args.stop_stable,
         )
     except BaseException as error:
         print(error)
-        emergency_cleanup(movie)
-        os.kill(os.getpid(), signal.SIGKILL)
+        if args.cleanup:
+            emergency_cleanup(movie)
+        else:
+            print("Completed stages are kept; run again to resume. (or use --cleanup)")
+        for child in multiprocessing.active_children():
+            child.terminate()
+        # Hard exit does not wait for pending threads, nor does it flush buffers.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(1)  # pylint: disable=W0212
 
 
 if __name__ == "__main__":
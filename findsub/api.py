@@ -0,0 +1,195 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to provide a programmatic API for ranking subtitles.
+Unlike `__main__.py` it prints nothing, writes no file and raises normal exceptions.
+Example:
+    >>> from findsub import rank
+    >>> ranking = rank(Path("audio.wav"), Path("subtitles/"))
+    >>> ranking.best.name, ranking.best.score, ranking.best.offset
+`numpy` library is required. -> https://pypi.org/project/numpy/
+Compatible with python3.9+.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterator, Mapping, Optional, Sequence, Union, cast
+
+import numpy as np
+
+from .corpus import decode_subtitle
+from .pycore import estimate_offset, score_ratios, speech_coverage
+from .pyvideo import VadEngine, speech_ratios
+from .subtitles import extract_subtitle_time, group_duplicates, parse_subtitle
+
+Times = list[tuple[timedelta, timedelta]]
+Base = Union[Path, np.ndarray, Sequence[tuple[int, int]], Times]
+Subtitles = Union[Path, Mapping[str, Union[str, bytes, Times]]]
+
+
+@dataclass
+class SubtitleResult:
+    """
+    Result of one subtitle. score is the ranking score; scores has every
+    computed score (see score_ratios function); offset is the estimated delay
+    (in seconds) that makes the subtitle most synced.
+    """
+
+    name: str
+    score: float
+    offset: int
+    scores: dict[str, float]
+    duplicates: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Ranking:
+    """
+    Sorted results (best first) and duration of every stage in seconds.
+    """
+
+    results: list[SubtitleResult]
+    timings: dict[str, float]
+
+    @property
+    def best(self) -> SubtitleResult:
+        """
+        Most synced subtitle.
+        """
+        return self.results[0]
+
+    def __iter__(self) -> Iterator[SubtitleResult]:
+        return iter(self.results)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+
+def base_ratios(base: Base, engine: Optional[VadEngine] = None) -> np.ndarray:
+    """
+    Speech ratio of every second from an audio (wave) file, already computed
+    ratios, a timeline of speech seconds ([(start, end), ...] in seconds) or
+    timings of a synced subtitle.
+    """
+    if isinstance(base, Path):
+        return speech_ratios(base, engine=engine)
+    if isinstance(base, np.ndarray):
+        return base.astype(np.float32, copy=False)
+    if not base:
+        raise ValueError("Base timeline is empty.")
+    if isinstance(base[0][0], timedelta):
+        cues = cast(Times, list(base))
+        length = int(max(end.total_seconds() for _, end in cues)) + 1
+        return speech_coverage(cues, length).astype(np.float32)
+    timeline = cast(Sequence[tuple[int, int]], base)
+    ratios = np.zeros(max(int(end) for _, end in timeline), dtype=np.float32)
+    for start, end in timeline:
+        ratios[int(start) : int(end)] = 1.0
+    return ratios
+
+
+def subtitle_times(subtitles: Subtitles) -> dict[str, Times]:
+    """
+    Timings of subtitles from a directory of srt files, or a mapping of names to
+    srt contents (str or bytes) or to already parsed timings.
+    Unreadable subtitles are left out.
+    """
+    result: dict[str, Times] = {}
+    if isinstance(subtitles, Path):
+        if not subtitles.is_dir():
+            raise NotADirectoryError(subtitles)
+        for item in sorted(subtitles.iterdir()):
+            if item.name.endswith(".srt") and (times := extract_subtitle_time(item)):
+                result[item.name] = times
+        return result
+
+    for name, value in subtitles.items():
+        if isinstance(value, bytes):
+            value = decode_subtitle(value) or ""
+        times = parse_subtitle(value) if isinstance(value, str) else list(value)
+        if times:
+            result[name] = times
+    return result
+
+
+def score_one(
+    ratios: np.ndarray,
+    times: Times,
+    thresholds: Sequence[float],
+    weighted: bool,
+    max_offset: int,
+) -> tuple[dict[str, float], int]:
+    """
+    All scores and estimated offset of one subtitle.
+    """
+    coverage = speech_coverage(times, len(ratios))
+    return (
+        score_ratios(ratios, coverage, thresholds, weighted),
+        estimate_offset(ratios, coverage, max_offset),
+    )
+
+
+def rank(
+    base: Base,
+    subtitles: Subtitles,
+    thresholds: Sequence[float] = (0.85,),
+    weighted: bool = False,
+    engine: Optional[VadEngine] = None,
+    max_offset: int = 30,
+    workers: Optional[int] = None,
+) -> Ranking:
+    """
+    Ranking subtitles by how much they are synced with the base (see base_ratios
+    and subtitle_times functions for accepted inputs). Ranking is based on the
+    weighted score if asked, otherwise the first threshold.
+    Subtitles with identical timings are scored once. workers=1 scores in process.
+    Raise ValueError if there is nothing to rank.
+    """
+    if not thresholds and not weighted:
+        raise ValueError("At least one threshold or weighted score is needed.")
+    key = "weighted" if weighted else f"{thresholds[0]:g}"
+    timings = {}
+
+    start = time.perf_counter()
+    ratios = base_ratios(base, engine)
+    timings["base"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sub_times = subtitle_times(subtitles)
+    if not sub_times:
+        raise ValueError("Cannot read any of the subtitles.")
+    groups = group_duplicates(sub_times)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    names = list(groups.keys())
+    args = (
+        [ratios] * len(names),
+        [sub_times[name] for name in names],
+        [thresholds] * len(names),
+        [weighted] * len(names),
+        [max_offset] * len(names),
+    )
+    if workers == 1:
+        scored = list(map(score_one, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            scored = list(executor.map(score_one, *args))
+    timings["match"] = time.perf_counter() - start
+
+    results = [
+        SubtitleResult(
+            name=name,
+            score=scores[key],
+            offset=offset,
+            scores=scores,
+            duplicates=groups[name][1:],
+        )
+        for name, (scores, offset) in zip(names, scored)
+    ]
+    results.sort(key=lambda result: result.score, reverse=True)
+    return Ranking(results=results, timings=timings)
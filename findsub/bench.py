@@ -0,0 +1,128 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to benchmark the downloading path of findsub against the
+local fixture site (see `fixtures.py`): listing, detail pages, downloads,
+unzipping and ranking, all offline.
+It reports subtitles per second and p50/p99 latency of requests.
+Usage:
+    findsub-bench -n 300 --latency 0.05 --error-rate 0.05
+Compatible with python3.9+.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from .clean import prepare_files
+from .download import Downloader
+from .fixtures import FixtureConfig, FixtureIMDb, FixtureServer, fixture_times
+from .movie import Movie
+from .pycore import match_all
+from .subtitles import extract_subtitle_times
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile. 0.0 for no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def benchmark(
+    config: FixtureConfig, deadline: float = Downloader.DEADLINE
+) -> dict[str, Any]:
+    """
+    Running the whole downloading path against the fixture site once.
+    """
+    with tempfile.TemporaryDirectory() as temp, FixtureServer(config) as server:
+        file = Path(temp) / f"{config.title.replace(' ', '.')}.{config.year}.mkv"
+        file.touch()
+        movie = Movie(file)
+        movie.imdb = FixtureIMDb(config)
+
+        downloader = Downloader(
+            movie=movie, langs=list(config.languages), deadline=deadline
+        )
+        downloader.SUBSCENE_URL = server.url
+
+        stages = {}
+        start = time.perf_counter()
+        directories = downloader.download()
+        stages["download"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for directory in directories.values():
+            prepare_files(directory, movie)
+        stages["prepare"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        base = [
+            (int(begin.total_seconds()), int(end.total_seconds()))
+            for begin, end in fixture_times(config)
+        ]
+        ranked = 0
+        for directory in directories.values():
+            ranked += len(match_all(base, extract_subtitle_times(directory)))
+        stages["rank"] = time.perf_counter() - start
+
+        shutil.rmtree(movie.temp())
+
+    total = sum(stages.values())
+    return {
+        "subtitles": ranked,
+        "expected": config.subtitles * len(config.languages),
+        "subtitles_per_second": ranked / total if total else 0.0,
+        "stages": stages,
+        "requests": len(downloader.request_times),
+        "served_errors": server.counters["errors"],
+        "p50": percentile(downloader.request_times, 0.50),
+        "p99": percentile(downloader.request_times, 0.99),
+    }
+
+
+def run() -> None:
+    """
+    EntryPoint of the benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark downloading against a local Subscene stand-in."
+    )
+    parser.add_argument("-n", "--subtitles", type=int, default=100)
+    parser.add_argument("-l", "--languages", default="english")
+    parser.add_argument("--cues", type=int, default=800)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--deadline", type=float, default=Downloader.DEADLINE)
+    args = parser.parse_args()
+
+    config = FixtureConfig(
+        subtitles=args.subtitles,
+        languages=tuple(args.languages.split(",")),
+        cues=args.cues,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    report = benchmark(config, args.deadline)
+
+    print(f"Subtitles: {report['subtitles']}/{report['expected']}")
+    print(f"Subtitles/second: {report['subtitles_per_second']:.2f}")
+    for stage, duration in report["stages"].items():
+        print(f"{stage.capitalize()}: {duration:.2f}s")
+    print(
+        f"Requests: {report['requests']} (served errors: {report['served_errors']})"
+        f" p50: {report['p50'] * 1_000:.1f}ms p99: {report['p99'] * 1_000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    run()
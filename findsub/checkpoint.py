@@ -0,0 +1,150 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to record completed stages of finding subtitles of a movie
+in a manifest in its scratch directory, so a failed run is resumed from where it stopped and
+only the failed stage is done again:
+    subtitles   downloaded and prepared subtitles of every language. (`.{identity}/<lang>`)
+    timeline    speech ratios of every second for a VAD setting. (`.{identity}_ratios.npy`)
+Every stage records its source too (subscene link or corpus, given audio and its
+modification time), a stage of another source is done again.
+Extracted audio needs no record, it is renamed to `.{identity}_audio_completed.wav`
+only when it is complete; parsed timings are kept in the sidecar index of every
+language. (`index.py`)
+Manifest is removed when the run is finished.
+`numpy` library is required. -> https://pypi.org/project/numpy/
+Compatible with python3.9+.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from .movie import Movie
+
+VERSION = 2
+
+
+def audio_source(movie: Movie, audio: Optional[Path] = None) -> dict[str, Any]:
+    """
+    Source of the speech timeline: the given audio file (and its modification
+    time) or the audio extracted from the movie.
+    """
+    if audio is None:
+        return {"movie": movie.identity}
+    return {"audio": str(audio), "mtime": audio.stat().st_mtime}
+
+
+class Checkpoint:
+    """
+    Manifest of completed stages of a movie. (see module's docstring)
+    """
+
+    def __init__(self, movie: Movie) -> None:
+        self.path = movie.temp(".json")
+        self.ratios_path = movie.temp("_ratios.npy")
+        self.stages: dict[str, Any] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, ValueError):
+            pass
+        else:
+            if data.get("version") == VERSION:
+                self.stages = data["stages"]
+
+    def get(self, stage: str) -> Any:
+        """
+        Recorded value of a completed stage, None if it is not completed.
+        """
+        return self.stages.get(stage)
+
+    def done(self, stage: str, value: Any = True) -> None:
+        """
+        Recording a completed stage.
+        """
+        self.stages[stage] = value
+        self.save()
+
+    def subtitles(
+        self, languages: list[str], source: dict[str, Any]
+    ) -> Optional[dict[str, Path]]:
+        """
+        Directories of downloaded subtitles if they are completed for the same
+        languages from the same source and are still there.
+        """
+        stage = self.get("subtitles")
+        if stage is None or (stage["languages"], stage["source"]) != (
+            languages,
+            source,
+        ):
+            return None
+        directories = {
+            lang: Path(directory) for lang, directory in stage["directories"].items()
+        }
+        if all(directory.is_dir() for directory in directories.values()):
+            return directories
+        return None
+
+    def done_subtitles(
+        self,
+        languages: list[str],
+        directories: dict[str, Path],
+        source: dict[str, Any],
+    ) -> None:
+        """
+        Recording downloaded subtitles. (subtitles stage)
+        """
+        self.done(
+            "subtitles",
+            {
+                "languages": languages,
+                "source": source,
+                "directories": {lang: str(path) for lang, path in directories.items()},
+            },
+        )
+
+    def save_ratios(
+        self, ratios: np.ndarray, vad: str, vad_mode: int, source: dict[str, Any]
+    ) -> None:
+        """
+        Keeping speech ratios of the movie. (timeline stage, see audio_source function)
+        """
+        temp = self.ratios_path.with_name(self.ratios_path.name + ".tmp")
+        with open(temp, "wb") as file:
+            np.save(file, ratios)
+        temp.replace(self.ratios_path)
+        self.done("timeline", {"vad": vad, "mode": vad_mode, "source": source})
+
+    def load_ratios(
+        self, vad: str, vad_mode: int, source: dict[str, Any]
+    ) -> Optional[np.ndarray]:
+        """
+        Kept speech ratios, None if they are missing or made with another VAD
+        setting or from another source.
+        """
+        if self.get("timeline") != {"vad": vad, "mode": vad_mode, "source": source}:
+            return None
+        try:
+            return np.load(self.ratios_path)
+        except (OSError, ValueError):
+            return None
+
+    def save(self) -> None:
+        """
+        Writing the manifest atomically.
+        """
+        temp = self.path.with_name(self.path.name + ".tmp")
+        with open(temp, "w", encoding="utf-8") as file:
+            json.dump({"version": VERSION, "stages": self.stages}, file, indent=4)
+        temp.replace(self.path)
+
+    def remove(self) -> None:
+        """
+        Removing the manifest and kept speech ratios.
+        """
+        self.path.unlink(missing_ok=True)
+        self.ratios_path.unlink(missing_ok=True)
@@ -17,7 +17,10 @@ import subprocess
 import zipfile
 from concurrent.futures import ALL_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .movie import Movie
 
 
 def hash_subtitles(directory: Path) -> None:
@@ -65,6 +68,36 @@ def unzip_remove(zip_file: Path) -> Optional[Path]:
         return directory
 
 
+def extracted_size(zip_file: Path) -> int:
+    """
+    Bytes of all the members of a zip file once extracted. 0 if it is broken.
+    """
+    try:
+        with zipfile.ZipFile(zip_file, "r") as file:
+            return sum(info.file_size for info in file.infolist())
+    except zipfile.BadZipfile:
+        return 0
+
+
+def fit_scratch(zip_files: list[Path], movie: "Movie") -> list[Path]:
+    """
+    Zip files that fit in the scratch budget of the movie once extracted (see
+    `Movie.check_scratch`), in order. The rest are removed.
+    """
+    zip_files = [file for file in zip_files if file.name.endswith(".zip")]
+    needed = 0
+    for num, zip_file in enumerate(zip_files):
+        needed += extracted_size(zip_file)
+        try:
+            movie.check_scratch(needed)
+        except OSError as error:
+            print(f"{error.strerror} Unzipping {num} of {len(zip_files)}.")
+            for item in zip_files[num:]:
+                item.unlink(missing_ok=True)
+            return zip_files[:num]
+    return zip_files
+
+
 def unzip_all_and_hash(zip_files: list[Path]) -> list[Path]:
     """
     Unzip and calculate hash for renaming concurrently.
@@ -80,16 +113,18 @@ def unzip_all_and_hash(zip_files: list[Path]) -> list[Path]:
     return [result for task in tasks if (result := task.result()) is not None]
 
 
-def iconv_subtitles(directory: Path) -> None:
+def iconv_subtitles(directory: Path, files: Optional[list[Path]] = None) -> None:
     """
     Converting non UTF-8 srt files to UTF-8. Based on `Convert.sh`.
     Because we are in subtitle directory, we must run shell script
     with leading two dots. (../Sample.sh)
+    If files are given, only they are checked; otherwise every srt file.
     """
+    if files is not None and not files:
+        return
     script_path = Path(__file__).parent / "scripts/Convert.sh"
     subprocess.call(
-        f'{script_path} "{directory}"',
-        shell=True,
+        [str(script_path), str(directory), *(file.name for file in files or [])],
         stdout=subprocess.DEVNULL,
     )
 
@@ -107,12 +142,15 @@ def move_up(directories: list[Path]) -> None:
         directory.rmdir()
 
 
-def prepare_files(directory: Path) -> None:
+def prepare_files(directory: Path, movie: Optional["Movie"] = None) -> None:
     """
     We will use only this function externally.
-    Check other functions docstring.
+    Check other functions docstring. If the movie is given, only zip files that
+    fit in its scratch budget are unzipped.
     """
     files = list(directory.iterdir())
+    if movie is not None:
+        files = fit_scratch(files, movie)
     dirs = unzip_all_and_hash(files)
     move_up(dirs)
     iconv_subtitles(directory)
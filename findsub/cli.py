@@ -34,6 +34,17 @@ def find_language(code: str) -> str:
     raise ValueError(f"{code!r} not found!")
 
 
+def find_languages(codes: str) -> list[str]:
+    """
+    Comma separated version of find_language function. "en,fa" -> ["english", "persian"]
+    """
+    languages = []
+    for code in codes.split(","):
+        if (language := find_language(code.strip())) not in languages:
+            languages.append(language)
+    return languages
+
+
 def parsing_args() -> argparse.Namespace:
     """
     Parsing the passed arguments, read help (-h, --help) for further information.
@@ -50,7 +61,7 @@ def parsing_args() -> argparse.Namespace:
     )
     group_link_dir = (
         parser.add_mutually_exclusive_group()
-    )  # Link or directory, not both!
+    )  # Link, directory or corpus; only one!
 
     parser.add_argument(
         "file", help="Select desired movie.", type=lambda x: pathlib.Path(x).absolute()
@@ -59,10 +70,11 @@ def parsing_args() -> argparse.Namespace:
     parser.add_argument(
         "-l",
         "--language",
+        dest="languages",
         default=os.environ.get("FINDSUB_LANG", "en"),
-        type=find_language,
+        type=find_languages,
         help="Two letter code for desired subtitle's language. (ISO 639-1) [Additionally: 'bz' -> "
-        "'brazillian-portuguese']",
+        "'brazillian-portuguese'] Several ones can be comma separated. (e.g. 'en,fa')",
     )
 
     group_link_dir.add_argument(
@@ -76,6 +88,20 @@ def parsing_args() -> argparse.Namespace:
         help="Check against already present subtitles in a directory.",
     )
 
+    group_link_dir.add_argument(
+        "-c",
+        "--corpus",
+        type=lambda x: pathlib.Path(x).absolute(),
+        help="Use a local corpus of subtitles (SQLite) instead of subscene.",
+    )
+
+    parser.add_argument(
+        "--title",
+        help="Title of the movie in the corpus. (instead of IMDB and the file name)",
+    )
+
+    parser.add_argument("--year", help="Year of the movie in the corpus.")
+
     parser.add_argument(
         "-b",
         "--synced-subtitle",
@@ -83,6 +109,93 @@ def parsing_args() -> argparse.Namespace:
         help="If you already have a synced subtitle, use it as base. (alot faster)",
     )
 
+    parser.add_argument(
+        "--ignore-embedded",
+        action="store_true",
+        help="Do not use the embedded text subtitle of the movie (if any) as base.",
+    )
+
+    parser.add_argument(
+        "-t",
+        "--thresholds",
+        nargs="+",
+        type=float,
+        help="Score with several speech thresholds (ratio of speech in one second) "
+        "at once; ranking is based on the first one. [e.g. 0.85 0.7 0.5]",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--weighted",
+        action="store_true",
+        help="Rank by a score weighted with the speech ratio of every second.",
+    )
+
+    parser.add_argument(
+        "--vad",
+        choices=("webrtc", "energy"),
+        default="webrtc",
+        help="Voice Activity Detector engine. 'energy' is faster but less accurate.",
+    )
+
+    parser.add_argument(
+        "--vad-mode",
+        type=int,
+        choices=range(4),
+        default=0,
+        help="Aggressiveness of Voice Activity Detector. (0 is the least aggressive)",
+    )
+
+    parser.add_argument(
+        "-m",
+        "--max-memory",
+        type=int,
+        help="Memory ceiling (MiB) for subtitles; they are parsed and matched in "
+        "batches instead of all at once. (for titles with thousands of subtitles)",
+    )
+
+    parser.add_argument(
+        "--top",
+        type=int,
+        help="Keep only this many best subtitles. (with -m/--max-memory)",
+    )
+
+    parser.add_argument(
+        "--anytime",
+        action="store_true",
+        help="Show provisional rankings while Voice Activity Detector is running.",
+    )
+
+    parser.add_argument(
+        "--stop-stable",
+        type=int,
+        metavar="K",
+        help="Stop the analysis early once order of the best K subtitles is stable. "
+        "(implies --anytime)",
+    )
+
+    parser.add_argument(
+        "--scratch",
+        type=lambda x: pathlib.Path(x).absolute(),
+        help="Directory for temporary files (audio, subtitles), e.g. a local SSD. "
+        'Default is set by "FINDSUB_SCRATCH" environment variable otherwise next '
+        "to the movie; only Subs is written there.",
+    )
+
+    parser.add_argument(
+        "--scratch-budget",
+        type=int,
+        help="Maximum size (MiB) of temporary files of the movie in scratch directory. "
+        '(or "FINDSUB_SCRATCH_BUDGET" environment variable)',
+    )
+
+    parser.add_argument(
+        "--cleanup",
+        action="store_true",
+        help="On failure, remove extracted audio and downloaded subtitles instead of "
+        "keeping them for resuming.",
+    )
+
     parser.add_argument(
         "-a",
         "--audio",
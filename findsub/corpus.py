@@ -0,0 +1,333 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to keep a local corpus of subtitles in an SQLite index,
+keyed by title, year and language, with precomputed packed timings. It can be
+used as a source of subtitles instead of Subscene and ranking against it needs
+no parsing at all.
+Compatible with python3.9+. No third-party library is required.
+Usage:
+    findsub-corpus <corpus.db> <directory-or-zip> -t <title> -y <year> -l <language>
+        -> import every srt file (also inside zip files) of the path to the corpus.
+    findsub -c/--corpus <corpus.db> <file> -> rank subtitles of the corpus.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import argparse
+import codecs
+import hashlib
+import os
+import pathlib
+import shutil
+import sqlite3
+import string
+import zipfile
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from .cli import find_language
+from .movie import Movie
+from .subtitles import pack_times, parse_subtitle, unpack_times
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subtitles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    year TEXT NOT NULL,
+    language TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    timings BLOB NOT NULL,
+    content BLOB NOT NULL,
+    UNIQUE (digest, title, year, language)
+);
+CREATE INDEX IF NOT EXISTS subtitles_lookup ON subtitles (title, year, language);
+PRAGMA user_version = 1;
+"""
+# Version 0 had digests unique across the whole corpus; the same file could not be
+# imported for another title, year or language.
+MIGRATION = """
+DROP INDEX IF EXISTS subtitles_lookup;
+ALTER TABLE subtitles RENAME TO subtitles_old;
+{schema}
+INSERT INTO subtitles SELECT * FROM subtitles_old;
+DROP TABLE subtitles_old;
+"""
+
+# Same encodings that `Convert.sh` knows about. Like `file` there, UTF-16 is only
+# recognized by its byte order mark; any even-length content decodes as UTF-16.
+ENCODINGS = ("utf-8-sig", "windows-1256")
+UTF16_BOMS = (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+
+def normalize_title(title: str) -> str:
+    """
+    Lower case title without punctuations and extra whitespaces.
+    """
+    table = str.maketrans("", "", string.punctuation)
+    return " ".join(title.translate(table).lower().split())
+
+
+def decode_subtitle(data: bytes) -> Optional[str]:
+    """
+    Decoding subtitle content by trying known encodings. None if all of them fail.
+    """
+    encodings = ("utf-16", *ENCODINGS) if data.startswith(UTF16_BOMS) else ENCODINGS
+    for encoding in encodings:
+        try:
+            return data.decode(encoding)
+        except UnicodeError:
+            continue
+    return None
+
+
+def read_subtitles(path: pathlib.Path) -> Iterable[bytes]:
+    """
+    Yielding content of every srt file in a path; srt files within zip files included.
+    """
+    if path.is_dir():
+        for item in sorted(path.rglob("*")):
+            if item.is_file():
+                yield from read_subtitles(item)
+    elif path.name.endswith(".srt"):
+        yield path.read_bytes()
+    elif path.name.endswith(".zip"):
+        try:
+            with zipfile.ZipFile(path, "r") as file:
+                for name in file.namelist():
+                    if name.endswith(".srt"):
+                        yield file.read(name)
+        except zipfile.BadZipfile:
+            pass
+
+
+class Corpus:
+    """
+    Local SQLite index of subtitles.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        exists = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'subtitles'"
+        ).fetchone()
+        if exists and version < 1:
+            self.connection.executescript(MIGRATION.format(schema=SCHEMA))
+        else:
+            self.connection.executescript(SCHEMA)
+
+    def add(self, data: bytes, title: str, year: str, language: str) -> bool:
+        """
+        Adding one subtitle to the corpus. Return False if it is unreadable or
+        already present.
+        """
+        if (content := decode_subtitle(data)) is None:
+            return False
+        if not (times := parse_subtitle(content)):
+            return False
+
+        encoded = content.encode("utf-8")
+        cursor = self.connection.execute(
+            "INSERT OR IGNORE INTO subtitles "
+            "(title, year, language, digest, timings, content) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                normalize_title(title),
+                str(year),
+                language,
+                hashlib.md5(encoded).hexdigest(),
+                pack_times(times),
+                encoded,
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def import_path(
+        self, path: pathlib.Path, title: str, year: str, language: str
+    ) -> int:
+        """
+        Importing every srt file in the path (see read_subtitles function).
+        Return number of newly added subtitles.
+        """
+        with self.connection:
+            return sum(
+                self.add(data, title, year, language) for data in read_subtitles(path)
+            )
+
+    def lookup(
+        self, title: str, year: str, language: str
+    ) -> dict[int, list[tuple[timedelta, timedelta]]]:
+        """
+        Return timings of subtitles of a movie by using the index. If nothing is
+        found with the year, it will be ignored.
+        """
+        query = "SELECT id, timings FROM subtitles WHERE title = ? AND language = ?"
+        params = [normalize_title(title), language]
+        rows = self.connection.execute(query + " AND year = ?", (*params, str(year)))
+        if not (result := rows.fetchall()):
+            result = self.connection.execute(query, params).fetchall()
+        return {id_: unpack_times(timings) for id_, timings in result}
+
+    def content(self, id_: int) -> bytes:
+        """
+        Return UTF-8 content of a subtitle.
+        """
+        row = self.connection.execute(
+            "SELECT content FROM subtitles WHERE id = ?", (id_,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(id_)
+        return row[0]
+
+    def close(self) -> None:
+        """
+        Closing the connection.
+        """
+        self.connection.close()
+
+
+class CorpusProvider:
+    """
+    Providing subtitles of a movie from a local corpus. Same interface as `Downloader`.
+    """
+
+    def __init__(
+        self,
+        movie: Movie,
+        langs: list[str],
+        corpus: pathlib.Path,
+        title: Optional[str] = None,
+        year: Optional[str] = None,
+    ) -> None:
+        self.langs = langs
+        self.movie = movie
+        self.corpus = corpus
+        self.title = title
+        self.year = year
+        self.times: dict[str, dict[str, list[tuple[timedelta, timedelta]]]] = {}
+
+    def identities(self) -> list[tuple[str, str]]:
+        """
+        Candidate (title, year) of the movie: the given title, otherwise the one IMDB
+        API finds and then the one the file name suggests. IMDB needs the network
+        and its title is not always the one subtitles are imported with.
+        """
+        if self.title is not None:
+            return [(self.title, self.year or "")]
+        candidates = []
+        try:
+            candidates.append(self.movie.search())
+        except Exception:  # pylint: disable=W0703
+            print("IMDB API cannot find the name of this movie.")
+        try:
+            name = self.movie.clean_filename()
+        except ValueError:
+            if not candidates:
+                raise
+        else:
+            year = self.movie.suggested_year
+            candidates.append((name.removesuffix(f" ({year})"), self.year or year))
+        return candidates
+
+    def find(
+        self, corpus: Corpus
+    ) -> tuple[str, str, dict[str, dict[int, list[tuple[timedelta, timedelta]]]]]:
+        """
+        The first candidate of identities method that the corpus has subtitles of,
+        with timings of its subtitles in every language that has any.
+        """
+        candidates = self.identities()
+        for name, year in candidates:
+            found = {}
+            for lang in self.langs:
+                if times := corpus.lookup(name, year, lang):
+                    found[lang] = times
+            if found:
+                return name, year, found
+        name, year = candidates[-1]
+        return name, year, {}
+
+    def download(self) -> dict[str, pathlib.Path]:
+        """
+        Look up the movie in the corpus and write the candidates of every language
+        to the hidden directory of the movie. Parsed timings are kept for
+        parsed_times method.
+        """
+        directory = self.movie.temp()
+        self.movie.scratch.mkdir(parents=True, exist_ok=True)
+        if directory.is_dir():
+            shutil.rmtree(directory)
+        os.mkdir(directory)
+
+        directories = {}
+        corpus = Corpus(self.corpus)
+        try:
+            name, year, found = self.find(corpus)
+            for lang in self.langs:
+                if not (candidates := found.get(lang)):
+                    print(f"No subtitle with {lang!r} language found in the corpus!")
+                    continue
+                directories[lang] = directory / lang
+                os.mkdir(directories[lang])
+                self.times[lang] = {}
+                for id_, times in candidates.items():
+                    (directories[lang] / f"{id_}.srt").write_bytes(corpus.content(id_))
+                    self.times[lang][f"{id_}.srt"] = times
+        finally:
+            corpus.close()
+
+        if not directories:
+            raise NotImplementedError(
+                f"No subtitle of {name!r} ({year}) with {self.langs!r} languages "
+                f"found in the corpus!"
+            )
+        print(
+            f"Corpus: {sum(map(len, self.times.values()))} subtitles of {name!r} ({year})."
+        )
+        return directories
+
+    def parsed_times(
+        self, lang: str
+    ) -> Optional[dict[str, list[tuple[timedelta, timedelta]]]]:
+        """
+        Timings are precomputed in the corpus, no need to parse the files again.
+        """
+        return self.times.get(lang)
+
+
+def run() -> None:
+    """
+    EntryPoint of the importer.
+    """
+    parser = argparse.ArgumentParser(description="Import subtitles to a corpus.")
+    parser.add_argument(
+        "corpus", help="Path of the corpus.", type=lambda x: pathlib.Path(x).absolute()
+    )
+    parser.add_argument(
+        "path",
+        help="Directory, srt or zip file to import.",
+        type=lambda x: pathlib.Path(x).absolute(),
+    )
+    parser.add_argument("-t", "--title", required=True, help="Title of the movie.")
+    parser.add_argument("-y", "--year", required=True, help="Year of the movie.")
+    parser.add_argument(
+        "-l",
+        "--language",
+        default=os.environ.get("FINDSUB_LANG", "en"),
+        type=find_language,
+        help="Two letter code for subtitles' language. (ISO 639-1)",
+    )
+    args = parser.parse_args()
+
+    assert args.path.exists(), f"Cannot find {args.path!r}"
+
+    corpus = Corpus(args.corpus)
+    try:
+        added = corpus.import_path(args.path, args.title, args.year, args.language)
+    finally:
+        corpus.close()
+    print(f"{added} subtitles added to {args.corpus}.")
+
+
+if __name__ == "__main__":
+    run()
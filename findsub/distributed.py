@@ -0,0 +1,280 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to split ranking across machines: speech timelines are
+made near the storage, subtitles are scored anywhere. Timelines and timings are
+exchanged in the format of `timeline.py` and jobs go through a shared queue
+directory:
+    <queue>/jobs/       pending jobs (JSON)
+    <queue>/claimed/    jobs taken by a worker (atomic rename), with the claim time;
+                        claims older than the lease go back to jobs/ (crashed worker)
+    <queue>/results/    scores of finished jobs
+    <queue>/failed/     jobs that raised, with the error
+Usage:
+    findsub-worker export-base <audio.wav|synced.srt> <base.fstl>
+    findsub-worker export-subs <subtitles-directory> <output-directory>
+    findsub-worker enqueue <queue> <base.fstl> <output-directory> -n 200
+    findsub-worker work <queue> [--follow] [--lease 600]
+    findsub-worker merge <queue> <base.fstl> <FindSub.json>
+Timelines are named by content identity of their source, so results of different
+movies never mix even if their audio files have the same name.
+Compatible with python3.9+.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import time
+import uuid
+from typing import Optional
+
+from .movie import content_hash
+from .pycore import match_all
+from .pyvideo import make_base
+from .subtitles import extract_subtitle_time
+from .timeline import dump_timeline, load_timeline
+from .tools import FINDSUB_INFO
+
+QUEUE_DIRS = ("jobs", "claimed", "results", "failed")
+LEASE = 600.0  # Seconds a claimed job may take before it is taken again.
+
+
+def make_queue(queue: pathlib.Path) -> None:
+    """
+    Making directories of the queue.
+    """
+    for name in QUEUE_DIRS:
+        (queue / name).mkdir(parents=True, exist_ok=True)
+
+
+def write_json(path: pathlib.Path, data: dict) -> None:
+    """
+    Writing JSON atomically, so other nodes never read a half written file.
+    """
+    temp = path.with_name(f".{path.name}.tmp")
+    with open(temp, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4)
+    temp.replace(path)
+
+
+def export_base(source: pathlib.Path, destination: pathlib.Path) -> None:
+    """
+    Exporting speech timeline of an extracted audio, or of a synced subtitle.
+    The timeline is named by content identity of the source.
+    """
+    if source.name.endswith(".srt"):
+        if not (times := extract_subtitle_time(source)):
+            raise UnicodeError(f"Cannot read '{source}'.")
+        base = [(int(i[0].total_seconds()), int(i[1].total_seconds())) for i in times]
+    else:
+        base = make_base(source)
+    dump_timeline(destination, base, content_hash(source))
+
+
+def export_subtitles(directory: pathlib.Path, destination: pathlib.Path) -> int:
+    """
+    Exporting timings of every readable srt file of a directory. Return the number.
+    """
+    destination.mkdir(parents=True, exist_ok=True)
+    exported = 0
+    for item in sorted(directory.iterdir()):
+        if item.name.endswith(".srt") and (times := extract_subtitle_time(item)):
+            dump_timeline(destination / f"{item.stem}.fstl", times, item.name)
+            exported += 1
+    return exported
+
+
+def enqueue(
+    queue: pathlib.Path, base: pathlib.Path, subtitles: pathlib.Path, shard: int
+) -> list[str]:
+    """
+    Making jobs of `shard` subtitles each. Paths must be reachable by workers
+    (shared storage). Return ids of the jobs.
+    """
+    make_queue(queue)
+    movie, _ = load_timeline(base)
+    files = sorted(str(item.absolute()) for item in subtitles.glob("*.fstl"))
+    ids = []
+    for i in range(0, len(files), shard):
+        job_id = uuid.uuid4().hex
+        write_json(
+            queue / "jobs" / f"{job_id}.json",
+            {
+                "id": job_id,
+                "movie": movie,
+                "base": str(base.absolute()),
+                "subtitles": files[i : i + shard],
+            },
+        )
+        ids.append(job_id)
+    return ids
+
+
+def requeue_stale(queue: pathlib.Path, lease: float = LEASE) -> int:
+    """
+    Putting claimed jobs older than the lease back to pending ones; their worker
+    has crashed. Return the number of them.
+    """
+    requeued = 0
+    now = time.time()
+    for job in (queue / "claimed").glob("*.json"):
+        try:
+            with open(job, "r", encoding="utf-8") as file:
+                claimed_at = json.load(file).get("claimed", 0.0)
+            # Renamed but claim time is not written yet (or it is of an old claim).
+            claimed_at = max(claimed_at, job.stat().st_mtime)
+            if now - claimed_at > lease:
+                os.rename(job, queue / "jobs" / job.name)
+                requeued += 1
+        except (FileNotFoundError, ValueError):  # Finished or being written.
+            continue
+    return requeued
+
+
+def claim(queue: pathlib.Path, lease: float = LEASE) -> Optional[pathlib.Path]:
+    """
+    Taking a pending job. Rename is atomic, so only one worker gets each job.
+    The claim time is recorded in the job. (see requeue_stale function)
+    """
+    requeue_stale(queue, lease)
+    for job in sorted((queue / "jobs").glob("*.json")):
+        claimed = queue / "claimed" / job.name
+        try:
+            os.rename(job, claimed)
+            os.utime(claimed)  # Rename keeps the time of enqueue.
+            with open(claimed, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:  # Another worker was faster.
+            continue
+        data["claimed"] = time.time()
+        write_json(claimed, data)
+        return claimed
+    return None
+
+
+def process(queue: pathlib.Path, job: pathlib.Path) -> None:
+    """
+    Scoring subtitles of a claimed job and writing its result.
+    """
+    with open(job, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    try:
+        _, base = load_timeline(pathlib.Path(data["base"]))
+        sub_times = {}
+        for subtitle in data["subtitles"]:
+            name, times = load_timeline(pathlib.Path(subtitle))
+            sub_times[name] = times
+        scores = match_all(base, sub_times)  # type: ignore
+    except Exception as error:  # pylint: disable=W0703
+        data["error"] = repr(error)
+        write_json(queue / "failed" / job.name, data)
+    else:
+        write_json(
+            queue / "results" / job.name,
+            {"id": data["id"], "movie": data["movie"], "scores": scores},
+        )
+    job.unlink(missing_ok=True)  # It may have been taken again after the lease.
+
+
+def work(
+    queue: pathlib.Path, follow: bool = False, poll: float = 1.0, lease: float = LEASE
+) -> int:
+    """
+    Processing jobs until the queue is empty (or forever if follow).
+    Return the number of processed jobs.
+    """
+    make_queue(queue)
+    processed = 0
+    while True:
+        if (job := claim(queue, lease)) is None:
+            if not follow:
+                return processed
+            time.sleep(poll)
+            continue
+        print(f"Processing {job.stem}.")
+        process(queue, job)
+        processed += 1
+
+
+def merge(queue: pathlib.Path, movie: str) -> dict[str, dict]:
+    """
+    Merging results of a movie (identity, see export_base function) to the
+    structure of `FindSub.json`.
+    """
+    scores: dict[str, float] = {}
+    for result in (queue / "results").glob("*.json"):
+        with open(result, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data["movie"] == movie:
+            scores.update(data["scores"])
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "Subs": {name: f"{score:.2%}" for name, score in ranked if score >= 0.0},
+        "FindSub": FINDSUB_INFO,
+    }
+
+
+def path(value: str) -> pathlib.Path:
+    """
+    Argument type of paths.
+    """
+    return pathlib.Path(value).absolute()
+
+
+def run() -> None:
+    """
+    EntryPoint of distributed mode.
+    """
+    parser = argparse.ArgumentParser(description="Distributed ranking of subtitles.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("export-base", help="Export a speech timeline.")
+    command.add_argument("source", type=path, help="Extracted audio or synced srt.")
+    command.add_argument("destination", type=path)
+
+    command = commands.add_parser("export-subs", help="Export subtitle timings.")
+    command.add_argument("directory", type=path)
+    command.add_argument("destination", type=path)
+
+    command = commands.add_parser("enqueue", help="Make jobs.")
+    command.add_argument("queue", type=path)
+    command.add_argument("base", type=path)
+    command.add_argument("subtitles", type=path, help="Directory of exported timings.")
+    command.add_argument("-n", "--shard", type=int, default=200)
+
+    command = commands.add_parser("work", help="Process jobs.")
+    command.add_argument("queue", type=path)
+    command.add_argument("--follow", action="store_true", help="Wait for new jobs.")
+    command.add_argument(
+        "--lease",
+        type=float,
+        default=LEASE,
+        help="Seconds after which jobs claimed by other (crashed) workers are retaken.",
+    )
+
+    command = commands.add_parser("merge", help="Merge results to FindSub.json.")
+    command.add_argument("queue", type=path)
+    command.add_argument("base", type=path, help="Base timeline of the movie.")
+    command.add_argument("output", type=path)
+
+    args = parser.parse_args()
+
+    if args.command == "export-base":
+        export_base(args.source, args.destination)
+    elif args.command == "export-subs":
+        print(f"{export_subtitles(args.directory, args.destination)} exported.")
+    elif args.command == "enqueue":
+        print(
+            f"{len(enqueue(args.queue, args.base, args.subtitles, args.shard))} jobs."
+        )
+    elif args.command == "work":
+        print(f"{work(args.queue, args.follow, lease=args.lease)} jobs processed.")
+    elif args.command == "merge":
+        movie, _ = load_timeline(args.base)
+        write_json(args.output, merge(args.queue, movie))
+
+
+if __name__ == "__main__":
+    run()
@@ -3,43 +3,178 @@
 """
 This module's goal is to download all subtitles of a suggested movie title
 in a specific language from Subscene site.
+Every request has connect/read timeouts and is retried with jittered backoff;
+concurrency adapts to the health of the site (see AdaptiveLimiter) and after an
+overall deadline ranking proceeds with whatever is downloaded.
 Compatible with python3.9+.
 `cloudscraper` library is required. -> https://pypi.org/project/cloudscraper/
-`beautifulsoup4` library is required. -> https://pypi.org/project/beautifulsoup4/
 `lxml` library is required. -> https://pypi.org/project/lxml/
 `tqdm` library is required. -> https://pypi.org/project/tqdm/
 Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 """
 
+import contextlib
+import itertools
 import os
+import random
 import shutil
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from datetime import timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Protocol, Union
 
 import cloudscraper  # type: ignore
-from bs4 import BeautifulSoup  # type: ignore
+import requests  # type: ignore
+from lxml import etree  # type: ignore
 from tqdm import tqdm  # type: ignore
 
 from .movie import Movie
 
 
+def iter_anchors(chunks: Iterable[Union[str, bytes]]) -> Iterator[etree._Element]:
+    """
+    Yielding `<a>` tags (with their attributes) as soon as they are parsed by lxml's
+    native pull parser; nothing else is inspected and the consumer can stop early.
+    """
+    parser = etree.HTMLPullParser(events=("start",), tag="a")
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            yield element
+    parser.close()
+    for _, element in parser.read_events():
+        yield element
+
+
+class SubtitleProvider(Protocol):
+    """
+    A source of subtitles. download method returns a directory of srt files for
+    every language. parsed_times method returns timings of a language if the
+    provider already has them (keyed by filename), otherwise None and files
+    should be prepared and parsed.
+    """
+
+    def download(self) -> dict[str, Path]:
+        """
+        Directories of srt (or zip) files, keyed by language.
+        """
+
+    def parsed_times(
+        self, lang: str
+    ) -> Optional[dict[str, list[tuple[timedelta, timedelta]]]]:
+        """
+        Timings of the subtitles of a language, if they are already parsed.
+        """
+
+
+class AdaptiveLimiter:
+    """
+    Limiting concurrent requests. The limit is increased additively while the site
+    is healthy and halved on throttling (429), server errors (5xx) or failures.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.active = 0
+        self.condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Waiting for a free slot and holding it.
+        """
+        with self.condition:
+            while self.active >= int(self.limit):
+                self.condition.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+
+    def feedback(self, healthy: bool) -> None:
+        """
+        Adapting the limit based on the outcome of a request.
+        """
+        with self.condition:
+            if healthy:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit / 2)
+            self.condition.notify_all()
+
+
 class Downloader:
     """
-    Download Subtitles from subscene.
+    Download Subtitles from subscene. Several languages are fetched from one listing.
     """
 
     SUBSCENE_URL = "https://subscene.com"
+    TIMEOUT = (5.0, 20.0)  # Connect, read. (seconds)
+    RETRIES = 3
+    BACKOFF = 0.5  # Base of exponential backoff. (seconds)
+    DEADLINE = 300.0  # Overall downloading deadline. (seconds)
 
     def __init__(
         self,
         movie: Movie,
-        lang: str,
+        langs: list[str],
         link: Optional[str] = None,
+        deadline: Optional[float] = DEADLINE,
     ) -> None:
-        self.lang = lang
+        self.langs = langs
         self.link = link
         self.movie = movie
+        self.deadline = deadline
+        self.deadline_at: Optional[float] = None
+        self.limiter = AdaptiveLimiter()
+        self.request_times: list[float] = []  # Duration of every attempt. (seconds)
+
+    def passed_deadline(self) -> bool:
+        """
+        Whether the overall downloading deadline is passed.
+        """
+        return self.deadline_at is not None and time.monotonic() > self.deadline_at
+
+    @contextlib.contextmanager
+    def request(
+        self, session: cloudscraper.Session, link: str, stream: bool = False
+    ) -> Iterator[Optional[requests.Response]]:
+        """
+        GET a link with timeouts and bounded retries with jittered exponential backoff.
+        Throttling, server errors and connection failures are retried; other
+        responses are yielded as is, with the limiter slot still held so reading
+        a streamed body counts too. Both are released on exit. Yield None if all
+        the attempts fail or the deadline is passed.
+        """
+        for attempt in range(self.RETRIES + 1):
+            if self.passed_deadline():
+                break
+            with self.limiter.slot():
+                start = time.perf_counter()
+                try:
+                    resp = session.get(link, timeout=self.TIMEOUT, stream=stream)
+                except requests.RequestException:
+                    resp = None
+                self.request_times.append(time.perf_counter() - start)
+                healthy = resp is not None and resp.status_code != 429
+                healthy = healthy and resp.status_code < 500
+                self.limiter.feedback(healthy)
+                if healthy:
+                    with resp:
+                        yield resp
+                    return
+            if resp is not None:
+                resp.close()
+            if attempt < self.RETRIES:
+                time.sleep(random.uniform(0, self.BACKOFF * 2**attempt))
+        yield None
 
     def suggest_link(self) -> None:
         """
@@ -66,42 +201,57 @@ class Downloader:
         Get HTML of a link. It will raise a ValueError if respond wasn't ok.
         """
         with cloudscraper.create_scraper() as session:
-            with session.get(self.link) as resp:  # type: ignore
-                if resp.ok:
+            with self.request(session, self.link) as resp:  # type: ignore
+                if resp is not None and resp.ok:
                     return resp.text
-                raise ValueError(
-                    f"Cannot find: {self.link!r}: {resp.status_code!r}\n"
-                    f"Please Specify the subscene link of this movie "
-                    f"explicitly with help of -s/--subscene option."
-                )
+                status = None if resp is None else resp.status_code
+            raise ValueError(
+                f"Cannot find: {self.link!r}: {status!r}\n"
+                f"Please Specify the subscene link of this movie "
+                f"explicitly with help of -s/--subscene option."
+            )
 
-    def get_subtitles_links(self) -> list[str]:
+    def get_subtitles_links(self) -> dict[str, list[str]]:
         """
-        Scraping Subscene page and return a list os subtitle download pages
-        with corresponding language.
+        Scraping Subscene page once and return lists of subtitle download pages
+        partitioned by language. Languages without any subtitle are left out.
         """
         content = self.get_content()
-        soup = BeautifulSoup(content, "lxml")
-        links: list[str] = []
-        for html_link in soup.find_all("a"):
-            if rf"/{self.lang}/" in html_link["href"]:
-                links.append(self.SUBSCENE_URL + html_link["href"])
+        links: dict[str, list[str]] = {}
+        for html_link in iter_anchors([content]):
+            href = html_link.get("href", "")
+            for lang in self.langs:
+                if rf"/{lang}/" in href:
+                    links.setdefault(lang, []).append(self.SUBSCENE_URL + href)
         if not links:
-            raise NotImplementedError(f"No subtitle with {self.lang!r} language found!")
+            raise NotImplementedError(
+                f"No subtitle with {self.langs!r} languages found!"
+            )
+        for lang in self.langs:
+            if lang not in links:
+                print(f"No subtitle with {lang!r} language found!")
         return links
 
     def extract_dl_link(
         self, link: str, session: cloudscraper.Session
     ) -> Optional[str]:
         """
-        Return download link from Subscene download page.
+        Return download link from Subscene download page. The page is streamed and
+        parsing (and downloading) stops as soon as the download button is found
+        or the deadline is passed.
         """
-        with session.get(link) as resp:
-            if resp.ok:
-                content = resp.text
-                soup = BeautifulSoup(content, "lxml")
-                download_button = soup.find("a", {"id": "downloadButton"})
-                return self.SUBSCENE_URL + download_button["href"]
+        with self.request(session, link, stream=True) as resp:
+            if resp is not None and resp.ok:
+                chunks = itertools.takewhile(  # A trickling one stops too.
+                    lambda _: not self.passed_deadline(),
+                    resp.iter_content(chunk_size=8192),
+                )
+                try:
+                    for html_link in iter_anchors(chunks):
+                        if html_link.get("id") == "downloadButton":
+                            return self.SUBSCENE_URL + html_link.get("href", "")
+                except requests.RequestException:
+                    pass
         return None
 
     def download_one(
@@ -117,50 +267,73 @@ class Downloader:
             dl_link = self.extract_dl_link(link, session)
 
             if dl_link is not None:
-                with session.get(link) as resp:
-                    if resp.ok:
-                        with open(directory / name, "wb") as file:
-                            for chunk in resp.iter_content(chunk_size=1024):
-                                file.write(chunk)
-                        return name
+                with self.request(session, dl_link, stream=True) as resp:
+                    if resp is not None and resp.ok:
+                        try:
+                            with open(directory / name, "wb") as file:
+                                for chunk in resp.iter_content(chunk_size=1024):
+                                    if self.passed_deadline():  # A trickling one.
+                                        break
+                                    file.write(chunk)
+                                else:
+                                    return name
+                        except requests.RequestException:
+                            pass
+                        (directory / name).unlink(missing_ok=True)
         return None
 
-    def download_all(self, links: list[str], directory: Path) -> list[str]:
+    def download_all(self, links: dict[Path, list[str]]) -> list[Path]:
         """
-        Extract download links of subtitles and download them concurrently.
+        Extract download links of subtitles and download them concurrently
+        to their directories. After the deadline, pending downloads are
+        cancelled and what is downloaded so far is returned.
         """
-        num = 0
-        with ThreadPoolExecutor() as executor:
+        if self.deadline is not None:
+            self.deadline_at = time.monotonic() + self.deadline
+        total = sum(len(value) for value in links.values())
+        with ThreadPoolExecutor(max_workers=self.limiter.maximum) as executor:
             downloads = {}
-            for link in links:
-                num += 1
-                name = f"{num}.zip"
-                task = executor.submit(
-                    self.download_one,
-                    link,
-                    name,
-                    directory,
-                )
-                downloads[task] = name
+            for directory, directory_links in links.items():
+                for num, link in enumerate(directory_links, start=1):
+                    name = f"{num}.zip"
+                    task = executor.submit(
+                        self.download_one,
+                        link,
+                        name,
+                        directory,
+                    )
+                    downloads[task] = directory
 
             results = []
-            for future in tqdm(
-                as_completed(downloads),
-                desc="Downloading Subtitles",
-                total=len(links),
-                bar_format="{desc}: {bar} {n_fmt}/{total_fmt} {percentage:3.0f}%",
-            ):
-                if (res := future.result()) is not None:
-                    results.append(res)
+            try:
+                for future in tqdm(
+                    as_completed(downloads, timeout=self.deadline),
+                    desc="Downloading Subtitles",
+                    total=total,
+                    bar_format="{desc}: {bar} {n_fmt}/{total_fmt} {percentage:3.0f}%",
+                ):
+                    if (res := future.result()) is not None:
+                        results.append(path := downloads[future] / res)
+                        self.movie.check_scratch(written=path.stat().st_size)
+            except TimeoutError:
+                print(f"Download deadline passed; continuing with {len(results)}.")
+                # Running ones are bounded by timeouts and the deadline itself.
+                executor.shutdown(wait=True, cancel_futures=True)
+            except OSError as error:  # Scratch budget.
+                print(f"{error.strerror} Continuing with {len(results)}.")
+                self.deadline_at = time.monotonic()  # Running ones stop too.
+                executor.shutdown(wait=True, cancel_futures=True)
 
         return results
 
-    def download(self) -> Path:
+    def download(self) -> dict[str, Path]:
         """
-        Main download entry point. It will make a directory with movie title (hidden) and cd to it.
-        download the files and return list of their filenames and directory path.
+        Main download entry point. It will make a directory with movie title (hidden)
+        and a directory for every language in it, download the files and return
+        the directories of languages.
         """
-        directory = self.movie.dir / f".{self.movie.filename_hash}"
+        directory = self.movie.temp()
+        self.movie.scratch.mkdir(parents=True, exist_ok=True)
 
         if directory.is_dir():
             shutil.rmtree(directory)
@@ -171,6 +344,19 @@ class Downloader:
             self.suggest_link()
 
         links = self.get_subtitles_links()
-        self.download_all(links, directory)
+        directories = {lang: directory / lang for lang in links.keys()}
+        for lang_directory in directories.values():
+            os.mkdir(lang_directory)
+        self.download_all(
+            {directories[lang]: lang_links for lang, lang_links in links.items()}
+        )
+
+        return directories
 
-        return directory
+    def parsed_times(
+        self, lang: str
+    ) -> Optional[dict[str, list[tuple[timedelta, timedelta]]]]:
+        """
+        Downloaded files are zipped and must be prepared and parsed.
+        """
+        return None
@@ -2,17 +2,24 @@
 
 """
 This module's goal is to extract audio of the movie in a way that satisfy the
-technical requirements of `webrtcvad`.
+technical requirements of `webrtcvad`. Long movies are split to segments that are
+extracted by several FFmpeg processes in parallel and then concatenated in order.
 `FFmpeg` is required. -> https://www.ffmpeg.org/
 `FFprobe` is required. -> https://ffmpeg.org/ffprobe.html
 Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 """
 
 import bisect
+import contextlib
+import json
+import math
+import os
 import shutil
 import subprocess
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING, Literal, TypeVar, Union
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
 
 if TYPE_CHECKING:
     from .movie import Movie
@@ -21,76 +28,263 @@ else:
 
 
 RATES = (8_000, 16_000, 32_000, 48_000)
+EXTRACT_RATES = (8_000, 16_000)  # Cheapest ones; VAD needs nothing more.
+SEGMENT_SECONDS = 600  # Movies longer than this are extracted in parallel segments.
+MAX_JOBS = 8
+TEXT_SUBTITLE_CODECS = frozenset(
+    ("subrip", "srt", "ass", "ssa", "mov_text", "webvtt", "text")
+)
+PARTIAL_SUBTITLE_TITLES = ("forced", "sdh")  # Lowercase, searched in titles.
 
 
 class FFmpegError(BaseException):
     """We Should terminate the program if this error is raised."""
 
 
-def find_sample_rate(rate: int) -> int:
+def find_sample_rate(rate: int, rates: tuple[int, ...] = RATES) -> int:
     """
     Find best sample rate. Closest lower one.
     """
-    index = bisect.bisect(RATES, rate)
+    index = bisect.bisect(rates, rate)
     if index == 0:
-        return RATES[0]
-    return RATES[index - 1]
+        return rates[0]
+    return rates[index - 1]
 
 
-def suggest_sample_rate(movie: Movie) -> Union[int, Literal[False]]:
+def probe(movie: Movie) -> dict[str, Any]:
     """
-    If sample_rate was in (8000, 16000, 32000, 48000)Hz,
-    we return a False and doesn't resample the rate; otherwise
-    we will choose closest lower sample rate.
+    Probing all streams of the container once with `FFprobe`.
+    In case of failure, an empty dictionary will return.
     """
     assert shutil.which("ffprobe") is not None, "Cannot find FFprobe."
 
-    command = (
-        f"ffprobe -hide_banner -select_streams a:0 -show_entries"
-        f" stream=sample_rate -of default=noprint_wrappers=1:nokey=1 '{movie.path}'"
-    )
+    command = [
+        "ffprobe",
+        "-hide_banner",
+        "-show_entries",
+        "stream=index,codec_type,codec_name,sample_rate"
+        ":stream_disposition=forced,hearing_impaired:stream_tags=title"
+        ":format=duration",
+        "-of",
+        "json",
+        str(movie.path),
+    ]
 
     try:
-        sample_rate = subprocess.check_output(
-            command, shell=True, stderr=subprocess.DEVNULL, text=True
-        ).strip()
+        output = subprocess.check_output(command, stderr=subprocess.DEVNULL, text=True)
     except subprocess.CalledProcessError:
+        return {}
+    else:
+        return json.loads(output)
+
+
+def suggest_sample_rate(movie: Movie, info: Optional[dict[str, Any]] = None) -> int:
+    """
+    Choosing the cheapest sample rate that VAD accepts: 16,000Hz, or 8,000Hz
+    if the source is poorer than that.
+    """
+    if info is None:
+        info = probe(movie)
+
+    audio_streams = [
+        stream
+        for stream in info.get("streams", [])
+        if stream.get("codec_type") == "audio" and "sample_rate" in stream
+    ]
+    if not audio_streams:
         print("FFprobe cannot extract audio sample rate! It will set to 16,000.")
         return 16_000
-    else:
-        rate = int(float(sample_rate))
-        if rate in RATES:
-            return False
-        return find_sample_rate(rate)
+
+    return find_sample_rate(int(float(audio_streams[0]["sample_rate"])), EXTRACT_RATES)
 
 
-def extract_audio(movie: Movie, cached_audio: Path) -> None:
+def find_duration(info: dict[str, Any]) -> Optional[float]:
     """
-    Extracting audio of the movie with help of `FFmpeg`.
-    16-bit. Mono. 32,000 Hz. Wav.
+    Duration of the movie in seconds, None if FFprobe didn't report it.
+    """
+    try:
+        return float(info["format"]["duration"])
+    except (KeyError, ValueError):
+        return None
+
+
+def is_partial_subtitle(stream: dict[str, Any]) -> bool:
+    """
+    Whether a subtitle stream is forced (only foreign parts) or SDH (sound cues too);
+    timings of neither of them are the timings of dialogs.
+    """
+    disposition = stream.get("disposition", {})
+    if disposition.get("forced") or disposition.get("hearing_impaired"):
+        return True
+    title = stream.get("tags", {}).get("title", "").lower()
+    return any(word in title for word in PARTIAL_SUBTITLE_TITLES)
+
+
+def find_text_subtitle(info: dict[str, Any]) -> Optional[int]:
+    """
+    Return the position (among subtitle streams) of the first text based subtitle
+    stream of the container. Bitmap subtitles (PGS, VobSub) are useless for us and
+    forced or SDH ones are skipped.
+    """
+    subtitle_streams = [
+        stream
+        for stream in info.get("streams", [])
+        if stream.get("codec_type") == "subtitle"
+    ]
+    for i, stream in enumerate(subtitle_streams):
+        if is_partial_subtitle(stream):
+            continue
+        if stream.get("codec_name") in TEXT_SUBTITLE_CODECS:
+            return i
+    return None
+
+
+def extract_embedded_subtitle(
+    movie: Movie, destination: Path, info: Optional[dict[str, Any]] = None
+) -> bool:
+    """
+    Extracting the first text subtitle stream of the container as srt.
+    Only the subtitle stream is mapped, so neither audio nor video gets decoded.
+    Return False if there is no such stream or extraction fails.
     """
+    if info is None:
+        info = probe(movie)
 
-    destination = movie.dir / f".{movie.filename_hash}_audio.wav"
+    if (stream := find_text_subtitle(info)) is None:
+        return False
 
     assert shutil.which("ffmpeg") is not None, "Cannot find FFmpeg."
-    if rate := suggest_sample_rate(movie):
-        command = (
-            f"ffmpeg -y -i '{movie.path}' -map a:0 -ar {rate} -acodec pcm_s16le"
-            f" -ac 1 '{destination}'"
-        )
-    else:
-        command = f"ffmpeg -y -i '{movie.path}' -map a:0 -acodec pcm_s16le -ac 1 '{destination}'"
+    command = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        str(movie.path),
+        "-map",
+        f"0:s:{stream}",
+        "-vn",
+        "-an",
+        "-c:s",
+        "srt",
+        str(destination),
+    ]
 
     return_code = subprocess.call(
-        command, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    if return_code or not destination.is_file():
+        destination.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def extract_segment(
+    movie: Movie,
+    rate: int,
+    destination: Path,
+    start: Optional[float] = None,
+    length: Optional[float] = None,
+) -> int:
+    """
+    Extracting (a segment of) the first audio track as raw 16-bit mono PCM.
+    Return the FFmpeg return code.
+    """
+    command = ["ffmpeg", "-y"]
+    if start is not None:
+        command += ["-ss", str(start)]  # Input seeking; no decoding before start.
+    if length is not None:
+        command += ["-t", str(length)]
+    command += [
+        "-i",
+        str(movie.path),
+        "-map",
+        "a:0",
+        "-ar",
+        str(rate),
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-f",
+        "s16le",
+        str(destination),
+    ]
+    return subprocess.call(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
     )
 
-    if return_code:  # Error
-        msg = "FFmpeg cannot extract audio! "
-        if ":" in str(movie.path):
-            msg += 'maybe because there is a ":" in filename!'
 
-        raise FFmpegError(msg)
+def split_segments(
+    duration: Optional[float],
+) -> list[tuple[Optional[float], Optional[float]]]:
+    """
+    Splitting the movie to (start, length) segments, one per job.
+    Short movies (or unknown duration) are extracted in one go: [(None, None)].
+    """
+    whole: list[tuple[Optional[float], Optional[float]]] = [(None, None)]
+    if duration is None or duration <= SEGMENT_SECONDS:
+        return whole
+    jobs = min(MAX_JOBS, os.cpu_count() or 1, math.ceil(duration / SEGMENT_SECONDS))
+    if jobs < 2:
+        return whole
+    length = math.ceil(duration / jobs)
+    # The last one is open-ended, so nothing at the end gets lost.
+    return [(i * length, length) for i in range(jobs - 1)] + [
+        ((jobs - 1) * length, None)
+    ]
+
+
+def extract_audio(
+    movie: Movie, cached_audio: Path, info: Optional[dict[str, Any]] = None
+) -> None:
+    """
+    Extracting audio of the movie with help of `FFmpeg`.
+    16-bit. Mono. 16,000 or 8,000 Hz. Wav.
+    """
+
+    destination = movie.temp("_audio.wav")
+
+    assert shutil.which("ffmpeg") is not None, "Cannot find FFmpeg."
+    if info is None:
+        info = probe(movie)
+    rate = suggest_sample_rate(movie, info)
+
+    duration = find_duration(info)
+    segments = split_segments(duration)
+    parts = [movie.temp(f"_audio_{i}.pcm") for i in range(len(segments))]
+    if duration is not None:
+        # Parts are removed as soon as they are appended, so at most one part
+        # is there besides the whole audio.
+        size = int(duration * rate * 2)
+        movie.check_scratch(size + size // len(segments))
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            return_codes = list(
+                executor.map(
+                    lambda args: extract_segment(movie, rate, *args),
+                    [(part, *segment) for part, segment in zip(parts, segments)],
+                )
+            )
+
+        if any(return_codes):  # Error
+            msg = "FFmpeg cannot extract audio! "
+            if ":" in str(movie.path):
+                msg += 'maybe because there is a ":" in filename!'
+
+            raise FFmpegError(msg)
+
+        with contextlib.closing(wave.open(str(destination), "wb")) as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(rate)
+            for part in parts:
+                with open(part, "rb") as pcm:
+                    while chunk := pcm.read(1 << 20):
+                        wav_file.writeframesraw(chunk)
+                part.unlink()
+    finally:
+        for part in parts:
+            part.unlink(missing_ok=True)
 
     # In case of SIGKILL the file doesn't exist!
     if destination.is_file():
@@ -0,0 +1,239 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to provide a local stand-in for Subscene and IMDB, so the
+downloading path can be exercised and measured offline and deterministically.
+The server mimics the listing, detail and download pages with configurable
+latency, error rate and zip payloads.
+Compatible with python3.9+. No third-party library is required.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import io
+import random
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .subtitles import parse_subtitle
+
+
+@dataclass
+class FixtureConfig:
+    """
+    How the fixture site behaves. latency and jitter are in seconds; error_rate
+    is the chance of a 503 response for any request.
+    """
+
+    title: str = "Fixture Movie"
+    year: int = 2021
+    subtitles: int = 100
+    languages: tuple[str, ...] = ("english",)
+    cues: int = 800
+    latency: float = 0.05
+    jitter: float = 0.02
+    error_rate: float = 0.0
+    padding: int = 20_000  # Bytes of junk HTML around detail page's download button.
+    seed: int = 24
+
+    @property
+    def slug(self) -> str:
+        """
+        Subscene like slug of the title. (same as `Downloader.suggest_link`)
+        """
+        return self.title.replace(":", "").replace(" ", "-").replace("'", "").lower()
+
+
+def make_srt(cues: int, offset: float, seed: int, credit: str = "") -> bytes:
+    """
+    Making a deterministic subtitle; offset (seconds) shifts all the cues and
+    credit is added to the text of the first one (like re-uploads do).
+    """
+    rnd = random.Random(seed)
+    lines = []
+    start = 5.0
+    for i in range(1, cues + 1):
+        start += rnd.uniform(1.0, 6.0)
+        end = start + rnd.uniform(0.8, 4.0)
+        lines.append(
+            f"{i}\n{srt_time(start + offset)} --> {srt_time(end + offset)}\n"
+            f"Line number {i}.{credit if i == 1 else ''}\n"
+        )
+        start = end
+    return "\n".join(lines).encode("utf-8")
+
+
+def srt_time(seconds: float) -> str:
+    """
+    Formatting seconds as srt timestamp.
+    """
+    seconds = max(seconds, 0.0)
+    millis = int(round(seconds * 1_000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1_000)
+    return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
+
+
+def make_zip(config: FixtureConfig, number: int) -> bytes:
+    """
+    Zip payload of a subtitle. Subtitles are shifted differently, so they
+    get ranked differently; ones with the same shift only differ in credit.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as file:
+        file.writestr(
+            f"{config.slug}.{number}.srt",
+            make_srt(config.cues, (number % 7) * 0.5, config.seed, f" #{number}"),
+        )
+    return buffer.getvalue()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serving the fixture site. (see FixtureServer)
+    """
+
+    server: "FixtureServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=W0622
+        pass
+
+    def send(self, status: int, body: bytes, content_type: str = "text/html") -> None:
+        """
+        Sending a complete response.
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # pylint: disable=C0103
+        """
+        Routing: /subtitles/<slug>, /subtitles/<slug>/<lang>/<n> and
+        /subtitle/download?mac=<lang>-<n>.
+        """
+        config = self.server.config
+        delay, failed = self.server.draw()
+        time.sleep(delay)
+        if failed:
+            self.server.count("errors")
+            self.send(503, b"Service Unavailable")
+            return
+
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        self.server.count("requests")
+
+        if parts == ["subtitles", config.slug]:
+            anchors = "".join(
+                f'<tr><td><a href="/subtitles/{config.slug}/{lang}/{n}">{lang} {n}</a>'
+                f"</td></tr>"
+                for lang in config.languages
+                for n in range(1, config.subtitles + 1)
+            )
+            self.send(
+                200, f"<html><body><table>{anchors}</table></body></html>".encode()
+            )
+        elif len(parts) == 4 and parts[:2] == ["subtitles", config.slug]:
+            padding = "<p>" + "x" * config.padding + "</p>"
+            body = (
+                f"<html><body>{padding}<div class='download'>"
+                f'<a id="downloadButton" href="/subtitle/download?mac={parts[2]}-{parts[3]}">'
+                f"Download</a></div>{padding}</body></html>"
+            )
+            self.send(200, body.encode())
+        elif parts == ["subtitle", "download"]:
+            mac = parse_qs(url.query).get("mac", ["-0"])[0]
+            number = int(mac.rsplit("-", 1)[1])
+            self.send(200, make_zip(config, number), "application/x-zip-compressed")
+        else:
+            self.send(404, b"Not Found")
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Local Subscene stand-in running in a background thread.
+    Use it as a context manager; url is the replacement of `Downloader.SUBSCENE_URL`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[FixtureConfig] = None) -> None:
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.config = config or FixtureConfig()
+        self.counters = {"requests": 0, "errors": 0}
+        self.lock = threading.Lock()
+        self.random = random.Random(self.config.seed)  # Guarded by the lock.
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        Base URL of the server.
+        """
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):  # Never for AF_INET; only narrowing the type.
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def draw(self) -> tuple[float, bool]:
+        """
+        Latency of a request and whether it fails, drawn from the seeded generator.
+        """
+        config = self.config
+        with self.lock:
+            jitter = self.random.uniform(-1, 1) * config.jitter
+            failed = self.random.random() < config.error_rate
+        return max(0.0, config.latency + jitter), failed
+
+    def count(self, counter: str) -> None:
+        """
+        Counting served requests and errors.
+        """
+        with self.lock:
+            self.counters[counter] += 1
+
+    def __enter__(self) -> "FixtureServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class FixtureIMDb:
+    """
+    IMDB stand-in for `Movie.imdb`; every search finds the fixture title.
+    """
+
+    class Result:
+        """
+        Same shape as IMDbPY search results.
+        """
+
+        def __init__(self, title: str, year: int) -> None:
+            self.data = {"title": title, "year": year}
+
+    def __init__(self, config: FixtureConfig) -> None:
+        self.config = config
+
+    def search_movie(self, _: str) -> list["FixtureIMDb.Result"]:
+        """
+        See class docstring.
+        """
+        return [self.Result(self.config.title, self.config.year)]
+
+
+def fixture_times(config: FixtureConfig) -> list[tuple[timedelta, timedelta]]:
+    """
+    Timings of the unshifted fixture subtitle; a perfectly synced base.
+    """
+    return parse_subtitle(make_srt(config.cues, 0.0, config.seed).decode("utf-8"))
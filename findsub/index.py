@@ -0,0 +1,133 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to keep a sidecar index in a directory of subtitles, so
+re-ranking it only converts, parses and matches new or changed files.
+Every srt file is identified by its size and mtime (and md5 if those changed)
+and has its packed timings and its scores against speech timelines.
+Compatible with python3.9+. No third-party library is required.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import base64
+import hashlib
+import json
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+from .subtitles import pack_times, unpack_times
+
+INDEX_NAME = ".findsub-index.json"
+VERSION = 1
+
+
+def timeline_identity(movie_time: list[tuple[int, int]]) -> str:
+    """
+    Identity of a speech timeline; scores are only valid for the same one.
+    """
+    return hashlib.md5(repr(movie_time).encode("ascii")).hexdigest()
+
+
+def file_md5(path: Path) -> str:
+    """
+    md5 hexdigest of a file.
+    """
+    with open(path, "rb") as file:
+        return hashlib.md5(file.read()).hexdigest()
+
+
+class SubtitleIndex:
+    """
+    Sidecar index of a directory of subtitles.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.path = directory / INDEX_NAME
+        self.entries: dict[str, dict[str, Any]] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, ValueError):
+            pass
+        else:
+            if data.get("version") == VERSION:
+                self.entries = data["entries"]
+
+    def is_fresh(self, path: Path) -> bool:
+        """
+        Whether the indexed data of the file is still valid. If only mtime
+        changed but content is the same, entry is refreshed.
+        """
+        if (entry := self.entries.get(path.name)) is None:
+            return False
+        stat = path.stat()
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if entry["size"] == stat.st_size and entry["md5"] == file_md5(path):
+            entry["mtime_ns"] = stat.st_mtime_ns
+            return True
+        return False
+
+    def changed_files(self, directory: Path) -> list[Path]:
+        """
+        srt files of the directory that are new or changed since last indexing.
+        """
+        return [
+            item
+            for item in sorted(directory.iterdir())
+            if item.name.endswith(".srt") and not self.is_fresh(item)
+        ]
+
+    def times(self, name: str) -> list[tuple[timedelta, timedelta]]:
+        """
+        Indexed timings of a subtitle. (empty list for unreadable ones)
+        """
+        return unpack_times(base64.b64decode(self.entries[name]["times"]))
+
+    def update(self, path: Path, times: list[tuple[timedelta, timedelta]]) -> None:
+        """
+        (Re)indexing a file; its old scores are dropped.
+        """
+        stat = path.stat()
+        self.entries[path.name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "md5": file_md5(path),
+            "times": base64.b64encode(pack_times(times)).decode("ascii"),
+            "scores": {},
+        }
+
+    def score(self, name: str, timeline: str) -> Optional[float]:
+        """
+        Score of a subtitle against a speech timeline, None if not indexed.
+        """
+        if (entry := self.entries.get(name)) is None:
+            return None
+        return entry["scores"].get(timeline)
+
+    def set_score(self, name: str, timeline: str, score: float) -> None:
+        """
+        Recording score of a subtitle against a speech timeline.
+        """
+        if (entry := self.entries.get(name)) is not None:
+            entry["scores"][timeline] = score
+
+    def prune(self, directory: Path) -> None:
+        """
+        Forgetting removed files.
+        """
+        self.entries = {
+            name: entry
+            for name, entry in self.entries.items()
+            if (directory / name).is_file()
+        }
+
+    def save(self) -> None:
+        """
+        Writing the index atomically.
+        """
+        temp = self.path.with_suffix(".tmp")
+        with open(temp, "w", encoding="utf-8") as file:
+            json.dump({"version": VERSION, "entries": self.entries}, file)
+        temp.replace(self.path)
@@ -6,24 +6,65 @@ official title of movie.
 Compatible with python3.9+.
 `IMDbPY` library is required. -> https://pypi.org/project/IMDbPY/
 In case of failure, it will raise a ValueError.
+Temporary files of a movie are made in its scratch directory; next to the movie
+by default, or "FINDSUB_SCRATCH" environment variable (e.g. a local SSD), with
+an optional budget in MiB by "FINDSUB_SCRATCH_BUDGET".
 Compatible with python3.9+.
 Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 """
 
+import errno
+import os
 import pathlib
+import shutil
 import string
+import time
 from datetime import date
+from functools import cached_property
 from hashlib import md5
+from typing import Optional
 
 from imdb import IMDb  # type: ignore
 
+SAMPLE_BLOCKS = 8
+SAMPLE_SIZE = 1 << 16  # 64 KiB.
+# Scratch usage is scanned again when the running total exceeds the budget, or when
+# the last scan is older than this; other processes (FFmpeg) write there too.
+SCAN_INTERVAL = 1.0  # Seconds.
+
+
+def content_hash(file: pathlib.Path) -> str:
+    """
+    Fast identity of content of a file: md5 of its size and a few evenly spaced
+    blocks. Blocks are read with positioned reads, not the whole file.
+    """
+    size = file.stat().st_size
+    digest = md5(str(size).encode("utf-8"))
+    if size <= SAMPLE_BLOCKS * SAMPLE_SIZE:
+        offsets = range(0, size, SAMPLE_SIZE)
+    else:
+        step = (size - SAMPLE_SIZE) // (SAMPLE_BLOCKS - 1)
+        offsets = range(0, SAMPLE_BLOCKS * step, step)
+    descriptor = os.open(file, os.O_RDONLY)
+    try:
+        for offset in offsets:
+            digest.update(os.pread(descriptor, SAMPLE_SIZE, offset))
+    finally:
+        os.close(descriptor)
+    return digest.hexdigest()
+
 
 class Movie:
     """
     Creating an instance of movie and process the data of it base on IMDB API.
     """
 
-    def __init__(self, file: pathlib.Path) -> None:
+    def __init__(
+        self,
+        file: pathlib.Path,
+        scratch: Optional[pathlib.Path] = None,
+        budget: Optional[int] = None,
+    ) -> None:
         self.path = file.absolute()
         self.filename = self.path.name
         self.filename_only = self.path.stem
@@ -33,6 +74,70 @@ class Movie:
         self.suggested_separator = "."
         self.suggested_year = ""
         self.imdb = IMDb()
+        if scratch is None and (env_scratch := os.environ.get("FINDSUB_SCRATCH")):
+            scratch = pathlib.Path(env_scratch)
+        self.scratch = self.dir if scratch is None else scratch.absolute()
+        if budget is None and (env_budget := os.environ.get("FINDSUB_SCRATCH_BUDGET")):
+            budget = int(env_budget) * 1024 * 1024
+        self.budget = budget  # Bytes.
+        self.scratch_used: Optional[int] = None  # Running total. (see check_scratch)
+        self.scanned_at = 0.0
+
+    @cached_property
+    def identity(self) -> str:
+        """
+        Content based identity (see content_hash function) used for naming caches
+        and temporary files, so they survive renames and same names never collide.
+        Name based if the file does not exist.
+        """
+        if self.path.is_file():
+            return content_hash(self.path)
+        return self.filename_hash
+
+    def temp(self, suffix: str = "") -> pathlib.Path:
+        """
+        Path of a temporary file (or directory) of the movie in the scratch directory.
+        """
+        return self.scratch / f".{self.identity}{suffix}"
+
+    def scratch_usage(self) -> int:
+        """
+        Bytes used by temporary files of the movie.
+        """
+        usage = 0
+        for item in self.scratch.glob(f".{self.identity}*"):
+            items = item.rglob("*") if item.is_dir() else [item]
+            usage += sum(i.stat().st_size for i in items if i.is_file())
+        return usage
+
+    def check_scratch(self, needed: int = 0, written: int = 0) -> None:
+        """
+        Raise an OSError if needed more bytes do not fit in the budget or in free
+        space of the scratch directory. Bytes written since the last check are
+        added to a running total of usage instead of scanning the scratch every
+        time; it is scanned again only when the total does not fit or after a while.
+        """
+        if self.budget is not None:
+            now = time.monotonic()
+            used = self.scratch_used
+            if (
+                used is None
+                or now - self.scanned_at > SCAN_INTERVAL
+                or used + written + needed > self.budget
+            ):
+                # Removed files are only noticed by scanning the scratch again.
+                used, self.scanned_at = self.scratch_usage(), now
+            else:
+                used += written
+            self.scratch_used = used
+            if used + needed > self.budget:
+                raise OSError(
+                    errno.ENOSPC,
+                    f"Scratch budget of {self.budget // 2**20} MiB is exceeded "
+                    f"({needed // 2**20} MiB more needed).",
+                )
+        if needed and shutil.disk_usage(self.scratch).free < needed:
+            raise OSError(errno.ENOSPC, f"No space left in {self.scratch}.")
 
     def _find_separator(self) -> str:
         """
@@ -60,7 +165,7 @@ class Movie:
         We have an assumption that file names are in this kind of patterns:
             'Borat.Subsequent.Moviefilm.2020.1080p.WEB-DL.RARBG.DigiMoviez.mkv'
             'Hellboy II The Golden Army 2008 720p (MarzFun.ir).mp4'
-        NO series support yet!
+        NO series support yet! (whole seasons are supported by `season.py`)
         """
         self.suggested_separator = self._find_separator()
         split_filename = self.filename_only.split(self.suggested_separator)
@@ -4,33 +4,321 @@
 This module's goal is to calculate mutual percentage of time between two data structure
 based on `subtitle.py` module. It will show how much they are potentially synchronous.
 `tqdm` library is required. -> https://pypi.org/project/tqdm/
+`numpy` library is required. -> https://pypi.org/project/numpy/
 Compatible with python3.9+.
 Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 """
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import heapq
+import itertools
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 from datetime import timedelta
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
 
+import numpy as np
 from tqdm import tqdm  # type: ignore
 
 from .core import match
+from .subtitles import group_duplicates, unpack_times
+
+if TYPE_CHECKING:
+    from .index import SubtitleIndex
 
 
 def match_all(
     movie_time: list[tuple[int, int]],
     sub_times: dict[str, list[tuple[timedelta, timedelta]]],
+    groups: Optional[dict[str, list[str]]] = None,
+    index: Optional["SubtitleIndex"] = None,
+    timeline: Optional[str] = None,
 ) -> dict[str, float]:
     """
     See match function docstring. matching concurrently and sorting the result.
+    Subtitles with identical timings are matched once and share the score.
+    If an index and identity of the timeline are given, indexed scores are reused
+    and new ones are recorded.
     """
+    if groups is None:
+        groups = group_duplicates(sub_times)
     result = {}
+    pending = []
+    for key, names in groups.items():
+        cached = None
+        if index is not None and timeline is not None:
+            cached = next(
+                (
+                    score
+                    for name in names
+                    if (score := index.score(name, timeline)) is not None
+                ),
+                None,
+            )
+        if cached is None:
+            pending.append(key)
+        else:
+            for name in names:
+                result[name] = cached
+
     with ProcessPoolExecutor() as executor:
-        tasks = {executor.submit(match, movie_time, v): k for k, v in sub_times.items()}
+        tasks = {executor.submit(match, movie_time, sub_times[k]): k for k in pending}
         for task in tqdm(
             as_completed(tasks.keys()),
             desc="Matching Subtitles",
-            total=len(sub_times),
+            total=len(pending),
             bar_format="{desc}: {bar} {n_fmt}/{total_fmt} {percentage:3.0f}%",
         ):
-            result[tasks[task]] = task.result()
+            score = task.result()
+            for name in groups[tasks[task]]:
+                result[name] = score
+
+    if index is not None and timeline is not None:
+        for name, score in result.items():
+            index.set_score(name, timeline, score)
     return dict(sorted(result.items(), key=lambda item: item[1], reverse=True))
+
+
+def match_packed(movie_time: list[tuple[int, int]], packed: bytes) -> float:
+    """
+    match function for packed times. (see `subtitles.pack_times`)
+    """
+    return match(movie_time, unpack_times(packed))
+
+
+def match_bounded(
+    movie_time: list[tuple[int, int]],
+    batches: Iterable[dict[str, tuple[bytes, str]]],
+    executor: Executor,
+    top: Optional[int] = None,
+) -> dict[str, float]:
+    """
+    Bounded memory version of match_all function. Batches of packed times
+    (see `subtitles.iter_subtitle_times`) are matched one after another, so only
+    one batch is in flight; only the best `top` results are kept in a heap.
+    Identical timings are matched once by the help of their fingerprints.
+    The executor is the same one that parses the batches. (see `subtitles.memory_plan`)
+    """
+    heap: list[tuple[float, str]] = []
+    scores: dict[str, float] = {}  # fingerprint -> score
+    with tqdm(
+        desc="Matching Subtitles",
+        bar_format="{desc}: {n_fmt} {rate_fmt}",
+    ) as progress:
+        for batch in batches:
+            pending = {}
+            for packed, fingerprint in batch.values():
+                if fingerprint not in scores and fingerprint not in pending:
+                    pending[fingerprint] = executor.submit(
+                        match_packed, movie_time, packed
+                    )
+            for fingerprint, task in pending.items():
+                scores[fingerprint] = task.result()
+            for name, (_, fingerprint) in batch.items():
+                item = (scores[fingerprint], name)
+                if top is None or len(heap) < top:
+                    heapq.heappush(heap, item)
+                else:
+                    heapq.heappushpop(heap, item)
+            progress.update(len(batch))
+    return {name: score for score, name in sorted(heap, reverse=True)}
+
+
+def speech_coverage(
+    times: list[tuple[timedelta, timedelta]], length: int, resolution: int = 100
+) -> np.ndarray:
+    """
+    Fraction of every one second of the movie that a subtitle has a text in it.
+    Resolution is number of samples in one second.
+    """
+    steps = np.zeros(length * resolution + 1, dtype=np.int32)
+    if times:
+        bounds = np.array(
+            [(start.total_seconds(), end.total_seconds()) for start, end in times]
+        )
+        bounds = np.clip(np.rint(bounds * resolution), 0, length * resolution)
+        bounds = bounds.astype(np.int64)
+        np.add.at(steps, bounds[:, 0], 1)
+        np.add.at(steps, bounds[:, 1], -1)
+    covered = np.cumsum(steps[:-1]) > 0  # Overlapping dialogs are counted once.
+    return covered.reshape(length, resolution).mean(axis=1)
+
+
+def score_ratios(
+    ratios: np.ndarray,
+    coverage: np.ndarray,
+    thresholds: Sequence[float],
+    weighted: bool = False,
+) -> dict[str, float]:
+    """
+    Scores for several thresholds (and speech ratio weighted score) in one pass.
+    With a threshold it is close to match function: how much of the seconds
+    that there is some speech going on, the subtitle has a text. (overlapping
+    dialogs are counted once, see speech_coverage function)
+    """
+    result = {}
+    for threshold in thresholds:
+        mask = ratios > threshold
+        total = mask.sum()
+        result[f"{threshold:g}"] = float(coverage[mask].sum() / total) if total else 0.0
+    if weighted:
+        total = ratios.sum()
+        result["weighted"] = float((coverage * ratios).sum() / total) if total else 0.0
+    return result
+
+
+def match_ratios(
+    ratios: np.ndarray,
+    times: list[tuple[timedelta, timedelta]],
+    thresholds: Sequence[float],
+    weighted: bool = False,
+) -> dict[str, float]:
+    """
+    See score_ratios function docstring.
+    """
+    return score_ratios(
+        ratios, speech_coverage(times, len(ratios)), thresholds, weighted
+    )
+
+
+def match_all_ratios(
+    ratios: np.ndarray,
+    sub_times: dict[str, list[tuple[timedelta, timedelta]]],
+    thresholds: Sequence[float],
+    weighted: bool = False,
+    groups: Optional[dict[str, list[str]]] = None,
+) -> tuple[dict[str, float], dict[str, dict[str, float]]]:
+    """
+    Same as match_all function but based on speech ratios of every second.
+    Return sorted result based on the weighted score (if asked) or the first
+    threshold, and all the scores of every subtitle.
+    """
+    if groups is None:
+        groups = group_duplicates(sub_times)
+    key = "weighted" if weighted else f"{thresholds[0]:g}"
+    details = {}
+    with ProcessPoolExecutor() as executor:
+        tasks = {
+            executor.submit(match_ratios, ratios, sub_times[k], thresholds, weighted): k
+            for k in groups.keys()
+        }
+        for task in tqdm(
+            as_completed(tasks.keys()),
+            desc="Matching Subtitles",
+            total=len(groups),
+            bar_format="{desc}: {bar} {n_fmt}/{total_fmt} {percentage:3.0f}%",
+        ):
+            scores = task.result()
+            for name in groups[tasks[task]]:
+                details[name] = scores
+    result = {name: scores[key] for name, scores in details.items()}
+    return (
+        dict(sorted(result.items(), key=lambda item: item[1], reverse=True)),
+        details,
+    )
+
+
+class AnytimeRanker:
+    """
+    Ranking subtitles on the part of the speech timeline analyzed so far.
+    Feed it speech ratios block by block (see `pyvideo.iter_speech_ratios`).
+    Scores are estimates of match function's (with threshold): subtitle coverage
+    is sampled every 10ms and overlapping dialogs are counted once, so they differ
+    slightly even when everything is fed.
+    """
+
+    def __init__(
+        self,
+        sub_times: dict[str, list[tuple[timedelta, timedelta]]],
+        length: int,
+        threshold: float = 0.85,
+        top_k: int = 5,
+        patience: int = 3,
+        groups: Optional[dict[str, list[str]]] = None,
+    ) -> None:
+        self.groups = group_duplicates(sub_times) if groups is None else groups
+        self.names = list(self.groups.keys())
+        self.length = length
+        self.threshold = threshold
+        self.top_k = top_k
+        self.patience = patience
+        self.coverage = np.zeros((len(self.names), length), dtype=np.float32)
+        for i, name in enumerate(self.names):
+            self.coverage[i] = speech_coverage(sub_times[name], length)
+        self.matched = np.zeros(len(self.names))
+        self.speech = 0
+        self.analyzed = 0
+        self.top: tuple[str, ...] = ()
+        self.unchanged = 0
+
+    def update(self, ratios: np.ndarray) -> dict[str, float]:
+        """
+        Adding the next block of speech ratios. Return the provisional ranking.
+        """
+        end = min(self.analyzed + len(ratios), self.length)
+        mask = ratios[: end - self.analyzed] > self.threshold
+        self.matched += self.coverage[:, self.analyzed : end][:, mask].sum(axis=1)
+        self.speech += int(mask.sum())
+        self.analyzed = end
+
+        ranking = self.ranking()
+        top = tuple(itertools.islice(ranking.keys(), self.top_k))
+        self.unchanged = self.unchanged + 1 if top == self.top else 0
+        self.top = top
+        return ranking
+
+    def ranking(self) -> dict[str, float]:
+        """
+        Sorted scores of every subtitle, duplicates included.
+        """
+        scores = self.matched / self.speech if self.speech else self.matched
+        result = {}
+        for i in np.argsort(-scores, kind="stable"):
+            for name in self.groups[self.names[i]]:
+                result[name] = float(scores[i])
+        return result
+
+    @property
+    def progress(self) -> float:
+        """
+        Fraction of the movie that is analyzed.
+        """
+        return self.analyzed / self.length if self.length else 1.0
+
+    @property
+    def margin(self) -> float:
+        """
+        Worst case error (95%) of provisional scores. Scores are means over the
+        speech seconds seen so far, a sample of all of them; it is zero at the end.
+        """
+        if not self.speech:
+            return 1.0
+        return min(1.0, 0.98 * ((1 - self.progress) / self.speech) ** 0.5)
+
+    @property
+    def stable(self) -> bool:
+        """
+        Whether order of the best top_k subtitles did not change in the last
+        `patience` updates.
+        """
+        return self.unchanged >= self.patience
+
+
+def estimate_offset(
+    ratios: np.ndarray, coverage: np.ndarray, max_offset: int = 30
+) -> int:
+    """
+    Estimating in how many seconds the subtitle should be delayed (negative: hastened)
+    to be most synced, by cross-correlation of speech ratios and subtitle coverage.
+    """
+    max_offset = min(max_offset, len(ratios) - 1, len(coverage) - 1)
+    if max_offset < 0 or not coverage.any():
+        return 0
+    size = len(ratios) + len(coverage)
+    correlation = np.fft.irfft(
+        np.fft.rfft(ratios, size) * np.conj(np.fft.rfft(coverage, size)), size
+    )
+    # Circular correlation; negative lags are at the end.
+    lags = np.concatenate(
+        (correlation[: max_offset + 1], correlation[size - max_offset :])
+    )
+    best = int(np.argmax(lags))
+    return best if best <= max_offset else best - len(lags)
@@ -1,11 +1,17 @@
 #! /usr/bin/env bash
 
 # Converting srt files to UTF-8.
+# Usage: Convert.sh <directory> [srt files...]; all srt files if none is given.
 # Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 
 cd "${1}" || exit 1;
+shift;
 
-for sub in *.srt; do
+if [ "$#" -eq 0 ]; then
+    set -- *.srt;
+fi
+
+for sub in "$@"; do
 	type=$(file -b "${sub}");
 	sub_name="${sub%%\.srt}";
 
@@ -0,0 +1,325 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to find subtitles of a whole season at once. The season
+listing is fetched once, speech of every episode is analyzed in parallel, every
+subtitle is scored against every episode in one matrix product and then every
+subtitle is assigned to the episode it is best synced with.
+Ranked subtitles of every episode are put in `Subs/<episode>` of the season directory.
+Usage:
+    findsub-season <season-directory> -> episodes are the video files in it.
+    findsub-season -s/--subscene <subscene-link> <season-directory>
+    findsub-season -d/--subtitles-directory <path-of-downloaded-subtitles> <season-directory>
+`numpy` library is required. -> https://pypi.org/project/numpy/
+Compatible with python3.9+.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import argparse
+import os
+import pathlib
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Any, Optional
+
+import numpy as np
+
+from .clean import iconv_subtitles, prepare_files
+from .cli import find_languages
+from .download import Downloader
+from .ffmpeg import extract_audio, extract_embedded_subtitle, probe
+from .movie import Movie
+from .pycore import speech_coverage
+from .pyvideo import make_vad, speech_ratios
+from .subtitles import extract_subtitle_time, extract_subtitle_times, group_duplicates
+from .tools import emergency_cleanup, make_subs_dir
+
+VIDEO_SUFFIXES = frozenset((".mkv", ".mp4", ".avi", ".m4v", ".mov", ".webm", ".ts"))
+EPISODE_JOBS = 4  # Every extraction itself runs several FFmpeg segments.
+ORDINALS = (
+    "first",
+    "second",
+    "third",
+    "fourth",
+    "fifth",
+    "sixth",
+    "seventh",
+    "eighth",
+    "ninth",
+    "tenth",
+    "eleventh",
+    "twelfth",
+)
+SEASON_PATTERN = re.compile(
+    r"(?:^|[^a-z])(?:s|season)[ ._-]?(\d{1,2})(?:e\d+)?(?:$|[^a-z\d])"
+)
+
+
+def find_episodes(directory: pathlib.Path) -> list[pathlib.Path]:
+    """
+    Video files of the directory, sorted by name.
+    """
+    return sorted(
+        item
+        for item in directory.iterdir()
+        if item.is_file()
+        and item.suffix.lower() in VIDEO_SUFFIXES
+        and not item.name.startswith(".")
+    )
+
+
+def season_number(name: str) -> Optional[int]:
+    """
+    Finding season number in a name: 'The.Office.S05', 'Dark Season 2'. None if not found.
+    """
+    if (match := SEASON_PATTERN.search(name.lower())) is None:
+        return None
+    return int(match.group(1))
+
+
+class SeasonDownloader(Downloader):
+    """
+    Same as `Downloader` but the suggested link is the listing of the season.
+    """
+
+    def __init__(
+        self, movie: Movie, langs: list[str], season: Optional[int], **kwargs: Any
+    ) -> None:
+        super().__init__(movie=movie, langs=langs, **kwargs)
+        self.season = season
+
+    def suggest_link(self) -> None:
+        super().suggest_link()
+        if self.season is None or not 1 <= self.season <= len(ORDINALS):
+            raise ValueError(
+                "Cannot suggest the link of this season. Please Specify the subscene "
+                "link of it explicitly with help of -s/--subscene option."
+            )
+        self.link = f"{self.link}-{ORDINALS[self.season - 1]}-season"
+        print(f"Season listing: {self.link!r}")
+
+
+def episode_ratios(
+    episode: pathlib.Path, vad: str = "webrtc", vad_mode: int = 0, embedded: bool = True
+) -> np.ndarray:
+    """
+    Speech ratios of every second of an episode (see `pyvideo.speech_ratios`).
+    An embedded text subtitle is used instead of audio if there is one.
+    """
+    movie = Movie(episode)
+    cached_audio = movie.temp("_audio_completed.wav")
+    embedded_subtitle = movie.temp("_embedded.srt")
+
+    if not cached_audio.is_file():
+        info = probe(movie)
+        if embedded and extract_embedded_subtitle(movie, embedded_subtitle, info):
+            times = extract_subtitle_time(embedded_subtitle)
+            embedded_subtitle.unlink(missing_ok=True)
+            if times:
+                length = int(max(end.total_seconds() for _, end in times)) + 1
+                return speech_coverage(times, length)
+        extract_audio(movie, cached_audio, info)
+
+    try:
+        return speech_ratios(cached_audio, engine=make_vad(vad, vad_mode))
+    finally:
+        cached_audio.unlink(missing_ok=True)
+
+
+def score_matrix(
+    ratios: list[np.ndarray],
+    sub_times: dict[str, list[tuple[timedelta, timedelta]]],
+    threshold: float = 0.85,
+) -> np.ndarray:
+    """
+    Scores of every subtitle (rows, in order of sub_times) against every episode
+    (columns), computed in one product: share of speech seconds of the episode
+    that the subtitle covers. Close to match function but not the same; coverage
+    is sampled every 10ms (see `pycore.speech_coverage`) and overlapping dialogs
+    are counted once.
+    """
+    length = max((len(item) for item in ratios), default=0)
+    speech = np.zeros((len(ratios), length), dtype=np.float32)
+    for i, item in enumerate(ratios):
+        speech[i, : len(item)] = item > threshold
+    coverage = np.zeros((len(sub_times), length), dtype=np.float32)
+    for i, times in enumerate(sub_times.values()):
+        coverage[i] = speech_coverage(times, length)
+    totals = speech.sum(axis=1)
+    return (coverage @ speech.T) / np.where(totals > 0, totals, 1)
+
+
+def assign(
+    episodes: list[str],
+    sub_times: dict[str, list[tuple[timedelta, timedelta]]],
+    scores: np.ndarray,
+) -> dict[str, dict[str, float]]:
+    """
+    Assigning every subtitle to the episode it is best synced with.
+    Return sorted results of every episode.
+    """
+    best = np.argmax(scores, axis=1) if scores.size else np.zeros(0, dtype=np.int64)
+    results: dict[str, dict[str, float]] = {episode: {} for episode in episodes}
+    for i, name in enumerate(sub_times.keys()):
+        results[episodes[best[i]]][name] = float(scores[i, best[i]])
+    return {
+        episode: dict(sorted(result.items(), key=lambda item: item[1], reverse=True))
+        for episode, result in results.items()
+    }
+
+
+def main(
+    directory: pathlib.Path,
+    languages: list[str],
+    subscene: Optional[str] = None,
+    subtitles_directory: Optional[pathlib.Path] = None,
+    embedded: bool = True,
+    vad: str = "webrtc",
+    vad_mode: int = 0,
+) -> None:
+    """
+    Main entry point of season mode. (see module's docstring)
+    """
+    episodes = find_episodes(directory)
+    if not episodes:
+        raise FileNotFoundError(f"No episode found in {directory}.")
+    print(f"{len(episodes)} episodes found.")
+
+    # Season "movie" lives inside the directory, so hidden files are made there.
+    season = Movie(directory / directory.name)
+    season.scratch.mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=min(EPISODE_JOBS, len(episodes))) as executor:
+        tasks = [
+            executor.submit(episode_ratios, episode, vad, vad_mode, embedded)
+            for episode in episodes
+        ]
+        print("Analysis of episodes begins.")
+
+        move = subtitles_directory is None
+        if subtitles_directory is None:
+            subtitles_directory = season.temp()
+            downloader = SeasonDownloader(
+                movie=season,
+                langs=languages,
+                season=season_number(directory.name),
+                link=subscene,
+            )
+            directories = downloader.download()  # One listing for the whole season.
+            for lang_directory in directories.values():
+                prepare_files(lang_directory, season)
+        else:
+            directories = {languages[0]: subtitles_directory}
+            iconv_subtitles(subtitles_directory)
+
+        print("Examining subtitles.", end=" ", flush=True)
+        sub_time_structures = {}
+        for lang, lang_directory in directories.items():
+            try:
+                sub_time_structures[lang] = extract_subtitle_times(lang_directory)
+            except UnicodeError:
+                print(f"Cannot read any of the {lang} subtitles.", end=" ")
+        print("Done.")
+
+        print("Waiting for analysis of episodes.", end=" ", flush=True)
+        ratios = [task.result() for task in tasks]
+        print("Done.")
+
+    names = [episode.stem for episode in episodes]
+    for lang, sub_times in sub_time_structures.items():
+        groups = group_duplicates(sub_times)
+        unique = {name: sub_times[name] for name in groups.keys()}
+        results = assign(names, unique, score_matrix(ratios, unique))
+        for episode, (name, result) in zip(episodes, results.items()):
+            if not result:
+                print(f"No {lang} subtitle is assigned to {name}.")
+                continue
+            print(f"{name}:")
+            make_subs_dir(
+                directories[lang],
+                {
+                    duplicate: score
+                    for sub, score in result.items()
+                    for duplicate in groups[sub]
+                },
+                subs=directory
+                / "Subs"
+                / name
+                / (lang if len(sub_time_structures) > 1 else ""),
+                move=move,
+                groups={sub: groups[sub] for sub in result.keys()},
+                movie=Movie(episode),
+            )
+
+    if move:
+        shutil.rmtree(subtitles_directory)
+    print("Done.")
+
+
+def run() -> None:
+    """
+    EntryPoint of season mode.
+    """
+    parser = argparse.ArgumentParser(description="Find subtitles of a whole season.")
+    parser.add_argument(
+        "directory",
+        help="Directory of episodes.",
+        type=lambda x: pathlib.Path(x).absolute(),
+    )
+    parser.add_argument(
+        "-l",
+        "--language",
+        dest="languages",
+        default=os.environ.get("FINDSUB_LANG", "en"),
+        type=find_languages,
+        help="Two letter code for subtitles' language. (ISO 639-1) Comma separated "
+        "for several languages.",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("-s", "--subscene", help="Subscene link of the season.")
+    group.add_argument(
+        "-d",
+        "--subtitles-directory",
+        type=lambda x: pathlib.Path(x).absolute(),
+        help="Use already downloaded subtitles of the season.",
+    )
+    parser.add_argument(
+        "--ignore-embedded",
+        action="store_true",
+        help="Do not use embedded text subtitles of episodes (if any) as base.",
+    )
+    parser.add_argument("--vad", choices=("webrtc", "energy"), default="webrtc")
+    parser.add_argument("--vad-mode", type=int, choices=range(4), default=0)
+    args = parser.parse_args()
+
+    assert args.directory.is_dir(), f"Cannot find {args.directory!r}"
+    if args.subtitles_directory is not None:
+        assert (
+            args.subtitles_directory.is_dir()
+        ), f"Cannot find {args.subtitles_directory!r}"
+        assert (
+            len(args.languages) == 1
+        ), "-d/--subtitles-directory holds subtitles of only one language."
+
+    try:
+        main(
+            directory=args.directory,
+            languages=args.languages,
+            subscene=args.subscene,
+            subtitles_directory=args.subtitles_directory,
+            embedded=not args.ignore_embedded,
+            vad=args.vad,
+            vad_mode=args.vad_mode,
+        )
+    except BaseException as error:
+        print(error)
+        emergency_cleanup(Movie(args.directory / args.directory.name))
+        for episode in find_episodes(args.directory):
+            emergency_cleanup(Movie(episode))
+        raise SystemExit(1) from error
+
+
+if __name__ == "__main__":
+    run()
@@ -8,11 +8,23 @@ Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 """
 
 import datetime
-from concurrent.futures import ALL_COMPLETED, ProcessPoolExecutor, wait
+import hashlib
+import os
+from array import array
+from concurrent.futures import ALL_COMPLETED, Executor, ProcessPoolExecutor, wait
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
 
 import srt  # type: ignore
 
+if TYPE_CHECKING:
+    from .index import SubtitleIndex
+
+# Rough peak memory of parsing and matching one subtitle in a worker. (bytes)
+SUBTITLE_MEMORY = 1 << 20
+# Rough memory of a worker process itself; interpreter and libraries. (bytes)
+WORKER_MEMORY = 48 << 20
+
 
 def extract_subtitle_time(
     file_name: Path,
@@ -24,38 +36,157 @@ def extract_subtitle_time(
     """
     try:
         with open(file_name, "r", encoding="utf-8") as file:
-            data = file.read().strip()
-        sub = srt.parse(data)
-        times = [(item.start, item.end) for item in sub]
-    except (UnicodeDecodeError, srt.SRTParseError):
+            data = file.read()
+    except UnicodeDecodeError:
+        return []
+    else:
+        return parse_subtitle(data)
+
+
+def parse_subtitle(data: str) -> list[tuple[datetime.timedelta, datetime.timedelta]]:
+    """
+    Same as extract_subtitle_time function but for already read content.
+    """
+    try:
+        times = [(item.start, item.end) for item in srt.parse(data.strip())]
+    except srt.SRTParseError:
         return []
     else:
         return times
 
 
+def pack_times(times: list[tuple[datetime.timedelta, datetime.timedelta]]) -> bytes:
+    """
+    Packing times to a compact binary form: flat float64 seconds.
+    ---> start1 end1 start2 end2 ...
+    """
+    flat = array("d")
+    for start, end in times:
+        flat.append(start.total_seconds())
+        flat.append(end.total_seconds())
+    return flat.tobytes()
+
+
+def unpack_times(data: bytes) -> list[tuple[datetime.timedelta, datetime.timedelta]]:
+    """
+    Reverse of pack_times function.
+    """
+    flat = array("d")
+    flat.frombytes(data)
+    return [
+        (
+            datetime.timedelta(seconds=flat[i]),
+            datetime.timedelta(seconds=flat[i + 1]),
+        )
+        for i in range(0, len(flat), 2)
+    ]
+
+
+def timing_fingerprint(
+    times: list[tuple[datetime.timedelta, datetime.timedelta]], quantum_ms: int = 100
+) -> str:
+    """
+    Hash of the cue start/end sequence quantized to `quantum_ms`. Re-uploads of the
+    same subtitle which only differ in text, encoding or line endings share it.
+    """
+    quantized = ",".join(
+        f"{int(start.total_seconds() * 1_000) // quantum_ms}-"
+        f"{int(end.total_seconds() * 1_000) // quantum_ms}"
+        for start, end in times
+    )
+    return hashlib.md5(quantized.encode("ascii")).hexdigest()
+
+
+def group_duplicates(
+    sub_times: dict[str, list[tuple[datetime.timedelta, datetime.timedelta]]],
+) -> dict[str, list[str]]:
+    """
+    Grouping subtitles with identical timing fingerprints.
+    ---> {representative: [representative, duplicate1, ...], ...}
+    """
+    groups: dict[str, list[str]] = {}
+    for name, times in sub_times.items():
+        groups.setdefault(timing_fingerprint(times), []).append(name)
+    return {names[0]: names for names in groups.values()}
+
+
 def extract_subtitle_times(
     directory: Path,
+    index: Optional["SubtitleIndex"] = None,
 ) -> dict[str, list[tuple[datetime.timedelta, datetime.timedelta]]]:
     """
     Making data structure for all subtitles concurrently.
     Check extract_subtitle_time function's docstring.
+    If an index is given, only new or changed files are parsed and indexed.
     """
-    subtitles = list(directory.iterdir())
+    subtitles = [
+        item
+        for item in directory.iterdir()
+        if item.name.endswith(".srt") and (index is None or not index.is_fresh(item))
+    ]
     tasks = {}
-    with ProcessPoolExecutor() as executor:
-        for subtitle in subtitles:
-            if subtitle.name.endswith(".srt"):
+    if subtitles:
+        with ProcessPoolExecutor() as executor:
+            for subtitle in subtitles:
                 tasks[subtitle.name] = executor.submit(
                     extract_subtitle_time,
                     subtitle.absolute(),
                 )
-        wait(tasks.values(), return_when=ALL_COMPLETED)
+            wait(tasks.values(), return_when=ALL_COMPLETED)
 
     result = {}
-    for key, value in tasks.items():
-        if val := value.result():
-            result[key] = val
+    if index is not None:
+        index.prune(directory)
+        for subtitle in subtitles:
+            index.update(subtitle, tasks[subtitle.name].result())
+        for key in index.entries.keys():
+            if val := index.times(key):
+                result[key] = val
+    else:
+        for key, value in tasks.items():
+            if val := value.result():
+                result[key] = val
 
     if result:
         return result
     raise UnicodeError("Cannot read any of the subtitles.")
+
+
+def extract_packed_time(file_name: Path) -> tuple[bytes, str]:
+    """
+    Packed version of extract_subtitle_time function with timing fingerprint.
+    Only this compact form leaves the worker process.
+    """
+    times = extract_subtitle_time(file_name)
+    return pack_times(times), timing_fingerprint(times)
+
+
+def memory_plan(max_memory: int) -> tuple[int, int]:
+    """
+    Number of worker processes and subtitles in a batch to stay below a memory
+    ceiling. (MiB) Workers take at most half of it, the rest is for the batch.
+    """
+    ceiling = max_memory << 20
+    workers = max(1, min(os.cpu_count() or 1, ceiling // 2 // WORKER_MEMORY))
+    return workers, max(1, (ceiling - workers * WORKER_MEMORY) // SUBTITLE_MEMORY)
+
+
+def iter_subtitle_times(
+    directory: Path, batch_size: int, executor: Executor
+) -> Iterator[dict[str, tuple[bytes, str]]]:
+    """
+    Streaming version of extract_subtitle_times function for bounded memory.
+    Subtitles are parsed concurrently (by the executor, see memory_plan) in
+    fixed-size batches and every batch is yielded as {name: (packed times,
+    fingerprint)}; unreadable ones are left out.
+    """
+    subtitles = sorted(
+        item.absolute() for item in directory.iterdir() if item.name.endswith(".srt")
+    )
+    for i in range(0, len(subtitles), batch_size):
+        batch = subtitles[i : i + batch_size]
+        yield {
+            subtitle.name: result
+            for subtitle, result in zip(batch, executor.map(extract_packed_time, batch))
+            if result[0]
+        }
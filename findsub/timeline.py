@@ -0,0 +1,90 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to store speech timelines (`pyvideo.make_base`) and parsed
+subtitle timings in a compact, versioned binary format, so they can be moved
+between machines.
+Format (little-endian):
+    magic b"FSTL" | version (uint8) | kind (uint8) | count (uint32) | name length (uint16)
+    | name (UTF-8) | count * (start, end) as float64 seconds
+Kind is 0 for speech timelines and 1 for subtitles.
+Compatible with python3.9+. No third-party library is required.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import struct
+from datetime import timedelta
+from pathlib import Path
+from typing import Union, cast
+
+from .subtitles import pack_times, unpack_times
+
+MAGIC = b"FSTL"
+VERSION = 1
+BASE, SUBTITLE = 0, 1
+HEADER = struct.Struct("<4sBBIH")
+Times = list[tuple[timedelta, timedelta]]
+
+
+class TimelineError(ValueError):
+    """Raised when a timeline file is corrupted or has an unknown version."""
+
+
+def dump_timeline(
+    path: Path,
+    times: Union[list[tuple[int, int]], Times],
+    name: str = "",
+) -> None:
+    """
+    Writing a speech timeline ([(int, int), ...] seconds) or subtitle timings
+    ([(timedelta, timedelta), ...]) to a file. Kind is chosen by the type of times.
+    """
+    if times and isinstance(times[0][0], timedelta):
+        kind, payload = SUBTITLE, pack_times(cast(Times, times))
+    else:
+        kind = BASE
+        timeline = cast(list[tuple[int, int]], times)
+        payload = pack_times(
+            [
+                (timedelta(seconds=start), timedelta(seconds=end))
+                for start, end in timeline
+            ]
+        )
+    encoded_name = name.encode("utf-8")
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, kind, len(times), len(encoded_name)))
+        file.write(encoded_name)
+        file.write(payload)
+    temp.replace(path)  # Readers never see a half written file.
+
+
+def load_timeline(
+    path: Path,
+) -> tuple[str, Union[list[tuple[int, int]], Times]]:
+    """
+    Reading a file written by dump_timeline function. Return its name and times.
+    """
+    data = path.read_bytes()
+    try:
+        magic, version, kind, count, name_length = HEADER.unpack_from(data)
+    except struct.error as error:
+        raise TimelineError(f"{path} is too short.") from error
+    if magic != MAGIC:
+        raise TimelineError(f"{path} is not a timeline file.")
+    if version != VERSION:
+        raise TimelineError(f"{path} has unsupported version {version!r}.")
+
+    start = HEADER.size + name_length
+    name = data[HEADER.size : start].decode("utf-8")
+    payload = data[start:]
+    if len(payload) != count * 16:
+        raise TimelineError(f"{path} is truncated.")
+
+    times = unpack_times(payload)
+    if kind == BASE:
+        return name, [
+            (int(begin.total_seconds()), int(end.total_seconds()))
+            for begin, end in times
+        ]
+    return name, times
@@ -8,23 +8,35 @@ Mahyar@Mahyar24.com, Thu 19 Aug 2021.
 
 import json
 import math
-import os
 import shutil
 from pathlib import Path
+from typing import Optional
 
+from .checkpoint import Checkpoint
 from .movie import Movie
 
+FINDSUB_INFO = {
+    "GitHub": "https://github.com/mahyar24/findsub",
+    "PyPI": "https://pypi.org/project/findsub/",
+    "E-Mail": "Mahyar@Mahyar24.com",
+}
+
 
 def emergency_cleanup(movie: Movie) -> None:
     """
     Clean all cached and unused file and directories in case of a sudden failure.
     """
-    completed_audio = movie.dir / f".{movie.filename_hash}_audio_completed.wav"
-    uncompleted_audio = movie.dir / f".{movie.filename_hash}_audio.wav"
-    hidden_sub_dir = movie.dir / f".{movie.filename_hash}"
+    completed_audio = movie.temp("_audio_completed.wav")
+    uncompleted_audio = movie.temp("_audio.wav")
+    embedded_subtitle = movie.temp("_embedded.srt")
+    hidden_sub_dir = movie.temp()
 
     completed_audio.unlink(missing_ok=True)
     uncompleted_audio.unlink(missing_ok=True)
+    embedded_subtitle.unlink(missing_ok=True)
+    Checkpoint(movie).remove()
+    for segment in movie.scratch.glob(f".{movie.identity}_audio_*.pcm"):
+        segment.unlink(missing_ok=True)
 
     try:
         shutil.rmtree(hidden_sub_dir)
@@ -52,38 +64,42 @@ def find_zero_pad_number(length_of_subtitles: int) -> int:
 
 
 def make_subs_dir(
-    directory: Path, results: dict[str, float], move: bool = True
+    directory: Path,
+    results: dict[str, float],
+    subs: Optional[Path] = None,
+    move: bool = True,
+    groups: Optional[dict[str, list[str]]] = None,
+    details: Optional[dict[str, dict[str, float]]] = None,
+    movie: Optional[Movie] = None,
 ) -> None:
     """
-    Make the Subs directory and rename subtitles based on coverage.
+    Make the Subs directory (by default next to the directory) and rename
+    subtitles based on coverage.
+    If groups of identical timings are given, they are listed under "Duplicates".
+    If all the scores of subtitles are given, they are listed under "Scores".
+    If the movie is given, its name and identity are listed under "Movie".
     """
-    base_dir = directory.parent.absolute()
-    subs = base_dir / "Subs"
+    if subs is None:
+        subs = directory.parent.absolute() / "Subs"
 
-    try:
-        os.mkdir(subs)
-    except FileExistsError:
-        pass
+    subs.mkdir(parents=True, exist_ok=True)
 
     zero_pad_num = find_zero_pad_number(len(results))
 
-    info: dict[str, dict[str, str]] = {
-        "Subs": {},
-        "FindSub": {
-            "GitHub": "https://github.com/mahyar24/findsub",
-            "PyPI": "https://pypi.org/project/findsub/",
-            "E-Mail": "Mahyar@Mahyar24.com",
-        },
-    }
+    info: dict[str, dict] = {"Subs": {}, "FindSub": FINDSUB_INFO}
+    if movie is not None:
+        info["Movie"] = {"Name": movie.filename, "Identity": movie.identity}
 
+    new_names = {}
     for i, sub in enumerate(results.keys()):
 
         old_file = directory / sub
         new_name = f"{i + 1}".zfill(zero_pad_num) + ".srt"
         new_file = subs / new_name
+        new_names[sub] = new_name
 
-        if move:
-            old_file.rename(new_file)
+        if move:  # Scratch directory may be on another file system.
+            shutil.move(old_file, new_file)
         else:
             try:
                 shutil.copy(old_file, new_file)
@@ -94,5 +110,18 @@ def make_subs_dir(
             print(f"{new_name}: {results[sub]:.2%}")
             info["Subs"][new_name] = f"{results[sub]:.2%}"
 
+    if details is not None:
+        info["Scores"] = {
+            new_names[sub]: {key: f"{value:.2%}" for key, value in scores.items()}
+            for sub, scores in details.items()
+        }
+
+    if groups is not None:
+        info["Duplicates"] = {
+            new_names[names[0]]: [new_names[name] for name in names[1:]]
+            for names in groups.values()
+            if len(names) > 1
+        }
+
     with open(subs / "FindSub.json", "w", encoding="utf-8") as info_file:
         json.dump(info, info_file, indent=4)
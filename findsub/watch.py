@@ -0,0 +1,279 @@
+#! /usr/bin/python3.9
+
+"""
+This module's goal is to watch a directory tree and find subtitles of every new
+movie as soon as it is completely written. New files are noticed by `inotify`
+(Linux) and a file is ready when its size does not change for a settling time;
+copies in progress are never picked. Ready movies are ranked with bounded
+concurrency in a pool of spawned processes, and movies that already have
+results are skipped. Results of every movie go to `Subs/<movie name>` next to
+it, so movies of one directory never overwrite each other's.
+Usage:
+    findsub-watch <directory> -l en -j 2
+Compatible with python3.9+. Linux only.
+Mahyar@Mahyar24.com, Thu 19 Aug 2021.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import multiprocessing
+import os
+import pathlib
+import select
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator
+
+from .__main__ import main
+from .cli import find_languages
+from .movie import Movie
+from .season import VIDEO_SUFFIXES
+from .tools import emergency_cleanup
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by the name.
+# Forking from a multithreaded process may deadlock the child; spawn is fork and exec.
+SPAWN = multiprocessing.get_context("spawn")
+
+
+class Inotify:
+    """
+    Minimal `inotify` binding. Directories are watched for new, written and
+    moved in entries.
+    """
+
+    MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO
+
+    def __init__(self) -> None:
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Cannot initialize inotify.")
+        self.directories: dict[int, pathlib.Path] = {}
+
+    def add(self, directory: pathlib.Path) -> None:
+        """
+        Watching a directory. (not its subdirectories)
+        """
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), ctypes.c_uint32(self.MASK)
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {directory}.")
+        self.directories[wd] = directory
+
+    def read(self, timeout: float) -> Iterator[tuple[int, pathlib.Path]]:
+        """
+        Yielding mask and path of events; waiting at most timeout seconds for them.
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return
+        data = os.read(self.fd, 1 << 16)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self.directories:
+                yield mask, self.directories[wd] / os.fsdecode(name)
+
+    def close(self) -> None:
+        """
+        Closing the file descriptor, all the watches are removed with it.
+        """
+        os.close(self.fd)
+
+
+def ignored(path: pathlib.Path) -> bool:
+    """
+    Hidden entries (our own temporary files too) and `Subs` directories are ignored.
+    """
+    return path.name.startswith(".") or path.name == "Subs"
+
+
+def is_movie(path: pathlib.Path) -> bool:
+    """
+    Whether a path looks like a movie.
+    """
+    return path.suffix.lower() in VIDEO_SUFFIXES and not ignored(path)
+
+
+def has_results(movie: Movie) -> bool:
+    """
+    Whether `Subs` next to the movie has results of it. (by its identity)
+    """
+    for info in (movie.dir / "Subs").rglob("FindSub.json"):
+        try:
+            with open(info, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if data.get("Movie", {}).get("Identity") == movie.identity:
+            return True
+    return False
+
+
+def subs_of(movie: Movie) -> pathlib.Path:
+    """
+    Results directory of a movie; every movie of a directory has its own.
+    """
+    return movie.dir / "Subs" / movie.path.stem
+
+
+def process_movie(path: pathlib.Path, options: dict[str, Any]) -> None:
+    """
+    Ranking subtitles of a movie. It runs in a spawned worker (see Pipeline).
+    Failures are reported and cleaned up; the worker goes on with other movies.
+    """
+    print(f"Finding subtitles of {path}.")
+    movie = Movie(path)
+    try:
+        main(movie=movie, subs_directory=subs_of(movie), **options)
+    except BaseException as error:
+        print(f"Failed {path}: {error}")
+        emergency_cleanup(movie)
+
+
+class Pipeline:
+    """
+    Ranking movies, at most `jobs` movies at a time, in a pool of spawned worker
+    processes that are started once. `main` forks (FFmpeg, workers) and must not
+    run in a multithreaded process; a worker runs one movie at a time in its only
+    thread.
+    """
+
+    def __init__(self, jobs: int, options: dict[str, Any]) -> None:
+        self.executor = ProcessPoolExecutor(max_workers=jobs, mp_context=SPAWN)
+        self.options = options
+        self.queued: set[pathlib.Path] = set()
+
+    def submit(self, path: pathlib.Path) -> None:
+        """
+        Queueing a movie unless it is already queued or has results.
+        """
+        if path in self.queued:
+            return
+        if has_results(Movie(path)):
+            print(f"Skipping {path}: it already has results.")
+            return
+        self.queued.add(path)
+        print(f"Queued {path}.")
+        future = self.executor.submit(process_movie, path, self.options)
+        future.add_done_callback(lambda _: self.queued.discard(path))
+
+    def shutdown(self) -> None:
+        """
+        Waiting for queued movies and stopping the workers.
+        """
+        self.executor.shutdown(wait=True)
+
+
+def watch(directory: pathlib.Path, pipeline: Pipeline, settle: float = 10.0) -> None:
+    """
+    Watching the tree forever. Movies already in it are checked first.
+    A movie is submitted once its size has not changed for settle seconds.
+    """
+    inotify = Inotify()
+    pending: dict[pathlib.Path, tuple[int, float]] = {}  # Size and since when.
+
+    def add_tree(root: pathlib.Path) -> None:
+        # Entries of a moved in directory make no events.
+        inotify.add(root)
+        for item in root.iterdir():
+            if item.is_dir() and not ignored(item):
+                add_tree(item)
+            elif item.is_file() and is_movie(item):
+                pending[item] = (-1, time.monotonic())
+
+    add_tree(directory)
+    print(f"Watching {directory}.")
+    try:
+        while True:
+            for mask, path in inotify.read(timeout=min(settle, 1.0)):
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not ignored(path):
+                        add_tree(path)
+                elif is_movie(path):
+                    pending[path] = (-1, time.monotonic())
+
+            now = time.monotonic()
+            for path, (size, since) in list(pending.items()):
+                try:
+                    current = path.stat().st_size
+                except FileNotFoundError:
+                    del pending[path]
+                    continue
+                if current != size:
+                    pending[path] = (current, now)
+                elif now - since >= settle:
+                    del pending[path]
+                    pipeline.submit(path)
+    finally:
+        inotify.close()
+
+
+def run() -> None:
+    """
+    EntryPoint of watch mode.
+    """
+    parser = argparse.ArgumentParser(description="Find subtitles of new movies.")
+    parser.add_argument(
+        "directory",
+        help="Directory to watch. (recursively)",
+        type=lambda x: pathlib.Path(x).absolute(),
+    )
+    parser.add_argument(
+        "-l",
+        "--language",
+        dest="languages",
+        default=os.environ.get("FINDSUB_LANG", "en"),
+        type=find_languages,
+        help="Two letter code for subtitles' language. (ISO 639-1) Comma separated "
+        "for several languages.",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=2, help="Movies to rank at the same time."
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=10.0,
+        help="Seconds that size of a new file must be unchanged. (copy is finished)",
+    )
+    parser.add_argument(
+        "--ignore-embedded",
+        action="store_true",
+        help="Do not use embedded text subtitles of movies (if any) as base.",
+    )
+    parser.add_argument("--vad", choices=("webrtc", "energy"), default="webrtc")
+    parser.add_argument("--vad-mode", type=int, choices=range(4), default=0)
+    args = parser.parse_args()
+
+    assert args.directory.is_dir(), f"Cannot find {args.directory!r}"
+
+    pipeline = Pipeline(
+        args.jobs,
+        {
+            "languages": args.languages,
+            "embedded": not args.ignore_embedded,
+            "vad": args.vad,
+            "vad_mode": args.vad_mode,
+        },
+    )
+    try:
+        watch(args.directory, pipeline, args.settle)
+    except KeyboardInterrupt:
+        print("Waiting for movies in progress.")
+    finally:
+        pipeline.shutdown()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,30 @@
+"""
+Tests of `findsub.api`.
+"""
+
+import unittest
+from datetime import timedelta
+
+import numpy as np
+
+from findsub.api import base_ratios
+
+
+class BaseRatiosTest(unittest.TestCase):
+    def test_timeline_of_seconds(self) -> None:
+        np.testing.assert_allclose(base_ratios([(0, 2), (3, 4)]), [1, 1, 0, 1])
+
+    def test_subtitle_timings(self) -> None:
+        cues = [
+            (timedelta(seconds=0.5), timedelta(seconds=3)),
+            (timedelta(seconds=1), timedelta(seconds=1.5)),  # Does not end last.
+        ]
+        np.testing.assert_allclose(base_ratios(cues), [0.5, 1, 1, 0])
+
+    def test_empty(self) -> None:
+        with self.assertRaises(ValueError):
+            base_ratios([])
+
+
+if __name__ == "__main__":
+    unittest.main()
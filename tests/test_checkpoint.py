@@ -0,0 +1,84 @@
+"""
+Tests of `findsub.checkpoint`.
+"""
+
+import os
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from findsub.checkpoint import Checkpoint, audio_source
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.directory.name)
+        # Only identity and temp method of a movie are needed; a real one opens IMDb.
+        self.movie = mock.Mock(identity="movie")
+        self.movie.temp = lambda suffix="": self.root / f".movie{suffix}"
+        self.ratios = np.array([0.0, 0.5, 1.0], dtype=np.float32)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_ratios_resumed(self) -> None:
+        source = audio_source(self.movie)
+        Checkpoint(self.movie).save_ratios(self.ratios, "webrtc", 0, source)
+        loaded = Checkpoint(self.movie).load_ratios("webrtc", 0, source)
+        np.testing.assert_array_equal(loaded, self.ratios)
+
+    def test_ratios_of_other_setting_or_source(self) -> None:
+        source = audio_source(self.movie)
+        Checkpoint(self.movie).save_ratios(self.ratios, "webrtc", 0, source)
+        checkpoint = Checkpoint(self.movie)
+        self.assertIsNone(checkpoint.load_ratios("energy", 0, source))
+        self.assertIsNone(checkpoint.load_ratios("webrtc", 2, source))
+        audio = self.root / "audio.wav"
+        audio.touch()
+        self.assertIsNone(
+            checkpoint.load_ratios("webrtc", 0, audio_source(self.movie, audio))
+        )
+
+    def test_changed_audio_is_another_source(self) -> None:
+        audio = self.root / "audio.wav"
+        audio.touch()
+        source = audio_source(self.movie, audio)
+        Checkpoint(self.movie).save_ratios(self.ratios, "webrtc", 0, source)
+        os.utime(audio, (0, 0))
+        self.assertNotEqual(audio_source(self.movie, audio), source)
+        self.assertIsNone(
+            Checkpoint(self.movie).load_ratios(
+                "webrtc", 0, audio_source(self.movie, audio)
+            )
+        )
+
+    def test_subtitles_of_other_source(self) -> None:
+        english = self.root / ".movie" / "english"
+        english.mkdir(parents=True)
+        source = {"subscene": None}
+        Checkpoint(self.movie).done_subtitles(["english"], {"english": english}, source)
+        checkpoint = Checkpoint(self.movie)
+        self.assertEqual(
+            checkpoint.subtitles(["english"], source), {"english": english}
+        )
+        self.assertIsNone(checkpoint.subtitles(["english"], {"subscene": "link"}))
+        self.assertIsNone(checkpoint.subtitles(["english", "farsi_persian"], source))
+        english.rmdir()
+        self.assertIsNone(checkpoint.subtitles(["english"], source))
+
+    def test_removed(self) -> None:
+        checkpoint = Checkpoint(self.movie)
+        checkpoint.save_ratios(self.ratios, "webrtc", 0, audio_source(self.movie))
+        checkpoint.remove()
+        self.assertIsNone(
+            Checkpoint(self.movie).load_ratios("webrtc", 0, audio_source(self.movie))
+        )
+        self.assertEqual(list(self.root.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests of `findsub.corpus`.
+"""
+
+import pathlib
+import sqlite3
+import tempfile
+import unittest
+
+from findsub.corpus import Corpus, decode_subtitle
+
+SUBTITLE = b"1\n00:00:01,000 --> 00:00:02,500\nHello\n\n2\n00:00:04,000 --> 00:00:05,000\nBye\n"
+OLD_SCHEMA = """
+CREATE TABLE subtitles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    year TEXT NOT NULL,
+    language TEXT NOT NULL,
+    digest TEXT NOT NULL UNIQUE,
+    timings BLOB NOT NULL,
+    content BLOB NOT NULL
+);
+CREATE INDEX subtitles_lookup ON subtitles (title, year, language);
+"""
+
+
+class CorpusTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name) / "corpus.db"
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_same_file_under_other_language(self) -> None:
+        corpus = Corpus(self.path)
+        with corpus.connection:
+            self.assertTrue(corpus.add(SUBTITLE, "Movie", "2020", "english"))
+            self.assertTrue(corpus.add(SUBTITLE, "Movie", "2020", "persian"))
+            self.assertFalse(corpus.add(SUBTITLE, "Movie", "2020", "english"))
+        self.assertEqual(len(corpus.lookup("movie", "2020", "persian")), 1)
+        corpus.close()
+
+    def test_lookup_unpacks_timings(self) -> None:
+        corpus = Corpus(self.path)
+        with corpus.connection:
+            corpus.add(SUBTITLE, "Movie", "2020", "english")
+        (times,) = corpus.lookup("movie", "1999", "english").values()
+        self.assertEqual(
+            [(start.total_seconds(), end.total_seconds()) for start, end in times],
+            [(1.0, 2.5), (4.0, 5.0)],
+        )
+        corpus.close()
+
+    def test_migrates_old_schema(self) -> None:
+        connection = sqlite3.connect(self.path)
+        connection.executescript(OLD_SCHEMA)
+        connection.close()
+        corpus = Corpus(self.path)
+        with corpus.connection:
+            corpus.add(SUBTITLE, "Movie", "2020", "english")
+            self.assertTrue(corpus.add(SUBTITLE, "Movie", "2020", "persian"))
+        corpus.close()
+
+
+class DecodeTest(unittest.TestCase):
+    def test_encodings(self) -> None:
+        self.assertEqual(decode_subtitle("سلام".encode("windows-1256")), "سلام")
+        self.assertEqual(decode_subtitle("سلام".encode("utf-16")), "سلام")
+        self.assertEqual(decode_subtitle("hello".encode("utf-8-sig")), "hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Tests of `findsub.download`.
+"""
+
+import threading
+import unittest
+from typing import Any, Iterator
+from unittest import mock
+
+from findsub.download import AdaptiveLimiter, Downloader, iter_anchors
+
+
+class FakeResponse:
+    """
+    Just enough of `requests.Response`.
+    """
+
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+class FakeSession:
+    """
+    Answering with the given status codes, in order.
+    """
+
+    def __init__(self, *codes: int) -> None:
+        self.responses = [FakeResponse(code) for code in codes]
+        self.calls = 0
+
+    def get(self, *_: Any, **__: Any) -> FakeResponse:
+        self.calls += 1
+        return self.responses[self.calls - 1]
+
+
+class AnchorsTest(unittest.TestCase):
+    def test_anchors_across_chunks(self) -> None:
+        page = (
+            '<html><body><p><a href="/a">A</a></p>'
+            '<div><a id="downloadButton" href="/subtitles/download">DL</a></div>'
+            "</body></html>"
+        )
+        chunks = [page[i : i + 7].encode() for i in range(0, len(page), 7)]
+        anchors = [(a.get("id"), a.get("href")) for a in iter_anchors(chunks)]
+        self.assertEqual(
+            anchors, [(None, "/a"), ("downloadButton", "/subtitles/download")]
+        )
+
+    def test_stops_early(self) -> None:
+        def chunks() -> Iterator[str]:
+            yield '<a href="/first">'
+            raise AssertionError("Read past the first anchor.")
+
+        self.assertEqual(next(iter_anchors(chunks())).get("href"), "/first")
+
+
+class LimiterTest(unittest.TestCase):
+    def test_additive_increase(self) -> None:
+        limiter = AdaptiveLimiter(initial=4, maximum=5)
+        limiter.feedback(True)
+        self.assertAlmostEqual(limiter.limit, 4.25)
+        for _ in range(100):
+            limiter.feedback(True)
+        self.assertEqual(limiter.limit, 5)
+
+    def test_multiplicative_decrease(self) -> None:
+        limiter = AdaptiveLimiter(initial=8, minimum=1)
+        limiter.feedback(False)
+        self.assertEqual(limiter.limit, 4)
+        for _ in range(10):
+            limiter.feedback(False)
+        self.assertEqual(limiter.limit, 1)
+
+    def test_slot_waits_for_limit(self) -> None:
+        limiter = AdaptiveLimiter(initial=1)
+        entered = threading.Event()
+
+        def other() -> None:
+            with limiter.slot():
+                entered.set()
+
+        with limiter.slot():
+            thread = threading.Thread(target=other)
+            thread.start()
+            self.assertFalse(entered.wait(0.1))
+        self.assertTrue(entered.wait(5))
+        thread.join()
+        self.assertEqual(limiter.active, 0)
+
+
+class RequestTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.downloader = Downloader(mock.Mock(), ["english"], deadline=None)
+        self.downloader.BACKOFF = 0.0
+
+    def test_slot_held_until_exit(self) -> None:
+        session = FakeSession(200)
+        with self.downloader.request(session, "link") as resp:
+            self.assertIs(resp, session.responses[0])
+            self.assertEqual(self.downloader.limiter.active, 1)
+        self.assertEqual(self.downloader.limiter.active, 0)
+        self.assertTrue(session.responses[0].closed)
+
+    def test_retries_server_errors(self) -> None:
+        session = FakeSession(503, 429, 404)
+        with self.downloader.request(session, "link") as resp:
+            self.assertIsNotNone(resp)
+            self.assertEqual(resp.status_code, 404)  # type: ignore
+        self.assertEqual(session.calls, 3)
+        self.assertTrue(all(resp.closed for resp in session.responses))
+        self.assertLess(self.downloader.limiter.limit, 4)
+
+    def test_gives_up(self) -> None:
+        session = FakeSession(*[500] * (Downloader.RETRIES + 1))
+        with self.downloader.request(session, "link") as resp:
+            self.assertIsNone(resp)
+        self.assertEqual(session.calls, Downloader.RETRIES + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+"""
+Tests of `findsub.ffmpeg`.
+"""
+
+import unittest
+from unittest import mock
+
+from findsub.ffmpeg import MAX_JOBS, SEGMENT_SECONDS, split_segments
+
+
+class SplitSegmentsTest(unittest.TestCase):
+    def test_short_or_unknown_in_one_go(self) -> None:
+        self.assertEqual(split_segments(None), [(None, None)])
+        self.assertEqual(split_segments(SEGMENT_SECONDS), [(None, None)])
+
+    @mock.patch("os.cpu_count", return_value=1)
+    def test_one_cpu_in_one_go(self, _: mock.Mock) -> None:
+        self.assertEqual(split_segments(SEGMENT_SECONDS * 4), [(None, None)])
+
+    @mock.patch("os.cpu_count", return_value=4)
+    def test_segments_cover_movie(self, _: mock.Mock) -> None:
+        duration = SEGMENT_SECONDS * 2.5
+        segments = split_segments(duration)
+        self.assertEqual(len(segments), 3)
+        length = segments[0][1]
+        assert length is not None
+        self.assertEqual(segments, [(0, length), (length, length), (2 * length, None)])
+        self.assertGreaterEqual(3 * length, duration)
+
+    @mock.patch("os.cpu_count", return_value=64)
+    def test_jobs_are_limited(self, _: mock.Mock) -> None:
+        self.assertEqual(len(split_segments(SEGMENT_SECONDS * 100)), MAX_JOBS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests of scratch accounting of `findsub.movie` and `findsub.clean`.
+"""
+
+import pathlib
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from findsub.clean import fit_scratch
+from findsub.movie import Movie
+
+
+class ScratchTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.directory.name)
+        with mock.patch("findsub.movie.IMDb"):  # It makes a database in cwd.
+            self.movie = Movie(self.root / "movie.mkv", budget=1_000)
+        self.movie.temp().mkdir()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, name: str, size: int) -> pathlib.Path:
+        """
+        Writing a file of size bytes in the scratch directory of the movie.
+        """
+        path = self.movie.temp() / name
+        path.write_bytes(b"x" * size)
+        return path
+
+    def test_running_total(self) -> None:
+        with mock.patch.object(
+            Movie, "scratch_usage", autospec=True, side_effect=Movie.scratch_usage
+        ) as usage:
+            self.movie.check_scratch()
+            for num in range(5):
+                self.movie.check_scratch(
+                    written=self.write(f"{num}", 100).stat().st_size
+                )
+            self.assertEqual(usage.call_count, 1)
+            self.assertEqual(self.movie.scratch_used, 500)
+            with self.assertRaises(OSError):
+                self.movie.check_scratch(needed=600)
+            self.assertEqual(usage.call_count, 2)
+
+    def test_removed_files_noticed(self) -> None:
+        self.movie.check_scratch(written=self.write("a", 800).stat().st_size)
+        (self.movie.temp() / "a").unlink()
+        self.movie.check_scratch(needed=600)  # Scanned again instead of failing.
+        self.assertEqual(self.movie.scratch_used, 0)
+
+    def test_unzipping_fits_budget(self) -> None:
+        zip_files = []
+        for num in range(3):
+            zip_files.append(path := self.movie.temp() / f"{num}.zip")
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as file:
+                file.writestr(f"{num}.srt", "x" * 400)
+        # Zip files themselves are in the scratch too, every one < 200 bytes.
+        self.movie.budget = 3 * 200 + 2 * 400
+        fitting = fit_scratch(zip_files, self.movie)
+        self.assertEqual(fitting, zip_files[:2])
+        self.assertFalse(zip_files[2].exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
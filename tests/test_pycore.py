@@ -0,0 +1,83 @@
+"""
+Tests of `findsub.pycore`.
+"""
+
+import unittest
+from datetime import timedelta
+
+import numpy as np
+
+from findsub.pycore import estimate_offset, score_ratios, speech_coverage
+
+
+def cues(*pairs: tuple[float, float]) -> list[tuple[timedelta, timedelta]]:
+    """
+    Cues from (start, end) seconds.
+    """
+    return [(timedelta(seconds=start), timedelta(seconds=end)) for start, end in pairs]
+
+
+class CoverageTest(unittest.TestCase):
+    def test_fractions_of_seconds(self) -> None:
+        coverage = speech_coverage(cues((0.5, 2.0)), 3)
+        np.testing.assert_allclose(coverage, [0.5, 1.0, 0.0])
+
+    def test_overlaps_counted_once(self) -> None:
+        coverage = speech_coverage(cues((0.0, 1.0), (0.5, 1.5)), 2)
+        np.testing.assert_allclose(coverage, [1.0, 0.5])
+
+    def test_clipped_to_length(self) -> None:
+        coverage = speech_coverage(cues((1.0, 10.0)), 2)
+        np.testing.assert_allclose(coverage, [0.0, 1.0])
+
+    def test_empty(self) -> None:
+        np.testing.assert_allclose(speech_coverage([], 2), [0.0, 0.0])
+
+
+class ScoreTest(unittest.TestCase):
+    def test_thresholds(self) -> None:
+        ratios = np.array([0.9, 0.6, 0.1, 0.8])
+        coverage = np.array([1.0, 0.0, 1.0, 0.5])
+        scores = score_ratios(ratios, coverage, [0.5, 0.85])
+        self.assertAlmostEqual(scores["0.5"], 1.5 / 3)
+        self.assertAlmostEqual(scores["0.85"], 1.0)
+        self.assertNotIn("weighted", scores)
+
+    def test_weighted(self) -> None:
+        ratios = np.array([0.5, 0.5, 0.0])
+        coverage = np.array([1.0, 0.0, 1.0])
+        scores = score_ratios(ratios, coverage, [], weighted=True)
+        self.assertAlmostEqual(scores["weighted"], 0.5)
+
+    def test_no_speech(self) -> None:
+        scores = score_ratios(np.zeros(3), np.ones(3), [0.5], weighted=True)
+        self.assertEqual(scores, {"0.5": 0.0, "weighted": 0.0})
+
+
+class OffsetTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ratios = np.zeros(60)
+        self.ratios[[10, 11, 12, 30, 31, 45]] = 1.0
+
+    def test_early_subtitle_is_delayed(self) -> None:
+        coverage = np.roll(self.ratios, -3)  # Every dialog three seconds early.
+        self.assertEqual(estimate_offset(self.ratios, coverage), 3)
+
+    def test_late_subtitle_is_hastened(self) -> None:
+        coverage = np.roll(self.ratios, 4)
+        self.assertEqual(estimate_offset(self.ratios, coverage), -4)
+
+    def test_bounded(self) -> None:
+        coverage = np.roll(self.ratios, 4)
+        self.assertIn(
+            estimate_offset(self.ratios, coverage, max_offset=2), range(-2, 3)
+        )
+
+    def test_degenerate(self) -> None:
+        self.assertEqual(estimate_offset(self.ratios, np.zeros(60)), 0)
+        coverage = np.roll(self.ratios, -3)
+        self.assertEqual(estimate_offset(self.ratios, coverage, max_offset=0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests of `findsub.pyvideo`.
+"""
+
+import contextlib
+import pathlib
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from findsub.pyvideo import EnergyVad, frames_to_ratios, speech_ratios
+
+RATE = 16_000
+
+
+def write_wave(path: pathlib.Path, samples: np.ndarray) -> None:
+    """
+    Writing a mono 16 bit wave file.
+    """
+    with contextlib.closing(wave.open(str(path), "wb")) as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(RATE)
+        wav_file.writeframes(samples.astype("<i2").tobytes())
+
+
+class RatiosTest(unittest.TestCase):
+    def test_partial_last_second(self) -> None:
+        frames = np.array([1, 1, 0, 0, 1, 1, 1], dtype=np.bool_)
+        np.testing.assert_allclose(frames_to_ratios(frames, 4), [0.5, 1.0])
+
+    def test_empty(self) -> None:
+        self.assertEqual(frames_to_ratios(np.zeros(0, dtype=np.bool_), 50).size, 0)
+
+
+class EnergyVadTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name) / "audio.wav"
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_tone_and_noise(self) -> None:
+        # Quiet hum, a loud 200 Hz tone, then loud white noise; one second each.
+        generator = np.random.default_rng(0)
+        seconds = np.arange(RATE) / RATE
+        samples = np.concatenate(
+            (
+                generator.normal(0, 30, RATE),
+                8_000 * np.sin(2 * np.pi * 200 * seconds),
+                generator.normal(0, 8_000, RATE),
+            )
+        )
+        write_wave(self.path, np.clip(samples, -32_768, 32_767))
+        ratios = speech_ratios(self.path, engine=EnergyVad())
+        np.testing.assert_allclose(ratios, [0.0, 1.0, 0.0])
+
+    def test_iter_speech_frames_length(self) -> None:
+        write_wave(self.path, np.zeros(RATE + 100))  # A partial frame at the end.
+        engine = EnergyVad()
+        frames = engine.speech_frames(self.path, 20, RATE)
+        blocks = list(engine.iter_speech_frames(self.path, 20, RATE))
+        self.assertEqual(len(frames), 50)
+        self.assertEqual(sum(len(block) for block in blocks), 50)
+
+    def test_empty(self) -> None:
+        write_wave(self.path, np.zeros(0))
+        self.assertEqual(EnergyVad().speech_frames(self.path, 20, RATE).size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Tests of `findsub.subtitles`.
+"""
+
+import unittest
+from datetime import timedelta
+
+from findsub.subtitles import (
+    group_duplicates,
+    pack_times,
+    timing_fingerprint,
+    unpack_times,
+)
+
+
+def cues(*pairs: tuple[float, float]) -> list[tuple[timedelta, timedelta]]:
+    """
+    Cues from (start, end) seconds.
+    """
+    return [(timedelta(seconds=start), timedelta(seconds=end)) for start, end in pairs]
+
+
+class FingerprintTest(unittest.TestCase):
+    def test_close_timings_share_fingerprint(self) -> None:
+        self.assertEqual(
+            timing_fingerprint(cues((1.0, 2.0), (3.0, 4.5))),
+            timing_fingerprint(cues((1.04, 2.02), (3.0, 4.55))),
+        )
+
+    def test_different_timings_differ(self) -> None:
+        self.assertNotEqual(
+            timing_fingerprint(cues((1.0, 2.0))), timing_fingerprint(cues((1.5, 2.0)))
+        )
+
+    def test_group_duplicates(self) -> None:
+        groups = group_duplicates(
+            {
+                "a.srt": cues((1, 2), (3, 4)),
+                "b.srt": cues((5, 6)),
+                "c.srt": cues((1, 2), (3, 4)),
+            }
+        )
+        self.assertEqual(groups, {"a.srt": ["a.srt", "c.srt"], "b.srt": ["b.srt"]})
+
+    def test_pack_round_trip(self) -> None:
+        times = cues((0.5, 1.25), (61.0, 62.75))
+        self.assertEqual(unpack_times(pack_times(times)), times)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Tests of `findsub.timeline`.
+"""
+
+import pathlib
+import tempfile
+import unittest
+from datetime import timedelta
+
+from findsub.timeline import HEADER, TimelineError, dump_timeline, load_timeline
+
+
+class TimelineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name) / "movie.fstl"
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_base_round_trip(self) -> None:
+        dump_timeline(self.path, [(1, 2), (5, 6)], "Movie (2020)")
+        self.assertEqual(load_timeline(self.path), ("Movie (2020)", [(1, 2), (5, 6)]))
+
+    def test_subtitle_round_trip(self) -> None:
+        times = [
+            (timedelta(seconds=1.25), timedelta(seconds=2.5)),
+            (timedelta(seconds=3), timedelta(seconds=4.75)),
+        ]
+        dump_timeline(self.path, times, "فیلم")
+        self.assertEqual(load_timeline(self.path), ("فیلم", times))
+
+    def test_empty(self) -> None:
+        dump_timeline(self.path, [])
+        self.assertEqual(load_timeline(self.path), ("", []))
+
+    def test_corrupted(self) -> None:
+        dump_timeline(self.path, [(1, 2)])
+        data = self.path.read_bytes()
+        for broken in (
+            data[: HEADER.size - 1],  # Short.
+            b"XXXX" + data[4:],  # Magic.
+            data[:4] + b"\x09" + data[5:],  # Version.
+            data[:-1],  # Truncated.
+        ):
+            self.path.write_bytes(broken)
+            with self.assertRaises(TimelineError):
+                load_timeline(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()